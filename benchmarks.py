@@ -0,0 +1,316 @@
+"""
+Benchmarks de generación de movimientos, búsqueda y entrenamiento.
+
+    python benchmarks.py                      # mide y compara con benchmark_baseline.json
+    python benchmarks.py --guardar-baseline   # mide y guarda la referencia
+    python benchmarks.py --salida res.json    # además escribe los resultados en JSON
+
+Los casos *_6x6, *_8x8 y *_10x10 miden cómo escalan la generación de movimientos,
+la búsqueda y el entrenamiento con el tamaño del tablero.
+
+Termina con código 1 si algún caso es más lento que la referencia
+por encima de la tolerancia.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import contextlib
+import numpy as np
+from constantes import *
+from tablero import Tablero
+from qlearning import QLearningAgent
+from minimax import minimax, evaluate_board, BusquedaAlfaBeta
+from motor import obtener_geometria
+import evaluacion_lote
+
+SEMILLA = 1234
+NUM_POSICIONES = 24
+BASELINE = 'benchmark_baseline.json'
+TAMANOS_ESCALADO = [(6, 6), (8, 8), (10, 10)]
+
+
+def posiciones_canonicas(n=NUM_POSICIONES, semilla=SEMILLA, geometria=None):
+    """Posiciones reproducibles: la inicial y otras alcanzadas con jugadas aleatorias con semilla fija"""
+    azar = random.Random(semilla)
+    posiciones = [(Tablero(geometria=geometria), ROJO)]
+    while len(posiciones) < n:
+        tablero, color = Tablero(geometria=geometria), ROJO
+        for _ in range(azar.randint(1, 12)):
+            movimientos = tablero.get_movimientos(color)
+            if not movimientos or tablero.ganador() is not None:
+                break
+            tablero.make_move(azar.choice(movimientos))
+            color = BLANCO if color == ROJO else ROJO
+        if tablero.ganador() is None and tablero.get_movimientos(color):
+            posiciones.append((tablero, color))
+    return posiciones
+
+
+def medir(funcion, repeticiones=5):
+    """
+    Ejecuta funcion (que devuelve cuántas operaciones hizo) varias veces
+    tras una vuelta de calentamiento y se queda con la repetición más rápida
+    """
+    funcion()  # Calentamiento: llena cachés y entradas de la tabla Q antes de medir
+    mejor = None
+    operaciones = 0
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        operaciones = funcion()
+        duracion = time.perf_counter() - inicio
+        if mejor is None or duracion < mejor:
+            mejor = duracion
+    return {
+        "operaciones": operaciones,
+        "segundos": mejor,
+        "ops_por_segundo": operaciones / mejor if mejor > 0 else 0.0
+    }
+
+
+def bench_get_movimientos_validos(posiciones, vueltas):
+    piezas = [(tablero, pieza) for tablero, _ in posiciones
+              for fila in tablero.tablero for pieza in fila if pieza != 0]
+
+    def caso():
+        for _ in range(vueltas):
+            for tablero, pieza in piezas:
+                tablero.get_movimientos_validos(pieza)
+        return vueltas * len(piezas)
+    return caso
+
+
+def bench_get_all_possible_moves(posiciones, vueltas):
+    """Generación de movimientos: la caché de sucesores se vacía antes de cada llamada"""
+    from damas import Juego
+    juego = Juego(ventana=None, q_agent=QLearningAgent())
+    cache = juego.cache_sucesores
+
+    def caso():
+        for _ in range(vueltas):
+            for tablero, color in posiciones:
+                cache.limpiar()
+                juego.tablero = tablero
+                juego.get_all_possible_moves(color)
+        return vueltas * len(posiciones)
+    return caso
+
+
+def bench_cache_sucesores(posiciones, vueltas):
+    """
+    get_all_possible_moves con las posiciones ya en la caché de sucesores
+    (la vuelta de calentamiento de medir la llena): mide los aciertos
+    """
+    from damas import Juego
+    juego = Juego(ventana=None, q_agent=QLearningAgent())
+
+    def caso():
+        for _ in range(vueltas):
+            for tablero, color in posiciones:
+                juego.tablero = tablero
+                juego.get_all_possible_moves(color)
+        return vueltas * len(posiciones)
+    return caso
+
+
+def bench_minimax(posiciones, profundidad):
+    def caso():
+        for tablero, color in posiciones:
+            minimax(tablero, profundidad, color == BLANCO)
+        return len(posiciones)
+    return caso
+
+
+def bench_generar_movimientos(posiciones, vueltas):
+    def caso():
+        for _ in range(vueltas):
+            for tablero, color in posiciones:
+                tablero.motor.generar_movimientos(color)
+        return vueltas * len(posiciones)
+    return caso
+
+
+def bench_alfabeta(posiciones, profundidad):
+    """Búsqueda a profundidad fija, sin límite de tiempo, para que el trabajo no dependa de la máquina"""
+    busqueda = BusquedaAlfaBeta(profundidad_maxima=profundidad, tiempo_ms=0, memoria_tt_mb=1)
+
+    def caso():
+        for tablero, color in posiciones:
+            busqueda.tt.limpiar()
+            busqueda.historia = {}
+            busqueda.buscar(tablero, color)
+        return len(posiciones)
+    return caso
+
+
+def bench_evaluate_board(posiciones, vueltas):
+    def caso():
+        for _ in range(vueltas):
+            for tablero, _ in posiciones:
+                evaluate_board(tablero)
+        return vueltas * len(posiciones)
+    return caso
+
+
+def bench_evaluar_lote(posiciones, vueltas, repetir=16):
+    """Posiciones por segundo evaluadas en un único lote de NumPy (comparable con evaluate_board)"""
+    motores = [tablero.motor for tablero, _ in posiciones] * repetir
+
+    def caso():
+        for _ in range(vueltas):
+            planos = evaluacion_lote.codificar(motores)
+            evaluacion_lote.evaluar(planos, motores[0].geometria)
+            evaluacion_lote.recompensas(planos, motores[0].geometria, False, 3)
+        return vueltas * len(motores)
+    return caso
+
+
+def bench_get_best_action(posiciones, vueltas):
+    agente = QLearningAgent()
+    entradas = [(agente.get_state_key(tablero), tablero.get_movimientos(color), tablero)
+                for tablero, color in posiciones]
+
+    def caso():
+        for _ in range(vueltas):
+            for state, movimientos, tablero in entradas:
+                agente.get_best_action(state, movimientos, tablero)
+        return vueltas * len(entradas)
+    return caso
+
+
+def bench_learn(posiciones, vueltas, memoria_q_mb=None):
+    agente = QLearningAgent(memoria_q_mb=memoria_q_mb)
+    entradas = []
+    for tablero, color in posiciones:
+        for movimiento in tablero.get_movimientos(color):
+            siguiente = tablero.copiar()
+            siguiente.make_move(movimiento)
+            entradas.append((agente.get_state_key(tablero), agente.get_action_key(tablero, movimiento),
+                             siguiente, siguiente.get_movimientos(color)))
+
+    def caso():
+        for _ in range(vueltas):
+            for state_key, action_key, siguiente, siguientes in entradas:
+                agente.learn(state_key, action_key, 1.0, siguiente, siguientes)
+        return vueltas * len(entradas)
+    return caso
+
+
+def bench_train_ai(episodios, geometria=None):
+    from damas import train_ai
+
+    def caso():
+        np.random.seed(SEMILLA)
+        anterior = os.getcwd()
+        # Directorio temporal para que los checkpoints no toquen la tabla Q real
+        with tempfile.TemporaryDirectory() as directorio:
+            os.chdir(directorio)
+            try:
+                with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+                    train_ai(episodios, QLearningAgent(), geometria=geometria)
+            finally:
+                os.chdir(anterior)
+        return episodios
+    return caso
+
+
+def ejecutar(rapido=False):
+    """Ejecuta todos los casos y devuelve {nombre: resultado}"""
+    random.seed(SEMILLA)
+    np.random.seed(SEMILLA)
+    posiciones = posiciones_canonicas()
+    escala = 1 if rapido else 5
+    casos = [
+        ("get_movimientos_validos", bench_get_movimientos_validos(posiciones, 100 * escala)),
+        ("get_all_possible_moves", bench_get_all_possible_moves(posiciones, 100 * escala)),
+        ("cache_sucesores", bench_cache_sucesores(posiciones, 100 * escala)),
+        ("minimax_profundidad_2", bench_minimax(posiciones, 2)),
+        ("minimax_profundidad_4", bench_minimax(posiciones, 4)),
+        ("evaluate_board", bench_evaluate_board(posiciones, 100 * escala)),
+        ("evaluar_lote", bench_evaluar_lote(posiciones, 10 * escala)),
+        ("get_best_action", bench_get_best_action(posiciones, 50 * escala)),
+        ("learn", bench_learn(posiciones, 20 * escala)),
+        ("learn_tabla_compacta", bench_learn(posiciones, 20 * escala, memoria_q_mb=16)),
+        ("train_ai", bench_train_ai(100 * escala)),
+    ]
+    for filas, columnas in TAMANOS_ESCALADO:
+        geometria = obtener_geometria(filas, columnas)
+        grandes = posiciones_canonicas(8, geometria=geometria)
+        tamano = f"{filas}x{columnas}"
+        casos += [
+            (f"generar_movimientos_{tamano}", bench_generar_movimientos(grandes, 50 * escala)),
+            (f"alfabeta_profundidad_4_{tamano}", bench_alfabeta(grandes, 4)),
+            (f"train_ai_{tamano}", bench_train_ai(4 * escala, geometria)),
+        ]
+    resultados = {}
+    for nombre, caso in casos:
+        resultados[nombre] = medir(caso, repeticiones=3 if rapido else 5)
+        print(f"{nombre:28s} {resultados[nombre]['ops_por_segundo']:>14.1f} ops/s")
+    return resultados
+
+
+def comparar(resultados, baseline, tolerancia):
+    """
+    Returns:
+        lista de (nombre, ops/s actual, ops/s de referencia) más lentos que la tolerancia
+    """
+    regresiones = []
+    for nombre, referencia in baseline.get("resultados", {}).items():
+        if nombre not in resultados:
+            continue
+        actual = resultados[nombre]["ops_por_segundo"]
+        if actual < referencia["ops_por_segundo"] * (1 - tolerancia):
+            regresiones.append((nombre, actual, referencia["ops_por_segundo"]))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del motor de damas")
+    parser.add_argument("--salida", help="archivo JSON donde escribir los resultados")
+    parser.add_argument("--baseline", default=BASELINE, help="resultados de referencia")
+    parser.add_argument("--guardar-baseline", action="store_true", help="guardar estos resultados como referencia")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="pérdida de rendimiento permitida (0.25 = 25%%)")
+    parser.add_argument("--rapido", action="store_true", help="menos iteraciones, resultados más ruidosos")
+    args = parser.parse_args()
+
+    informe = {
+        "python": platform.python_version(),
+        "maquina": platform.machine(),
+        "semilla": SEMILLA,
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "resultados": ejecutar(args.rapido)
+    }
+
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(informe, f, indent=2)
+
+    if args.guardar_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(informe, f, indent=2)
+        print(f"\nReferencia guardada en {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo hay referencia en {args.baseline}; usa --guardar-baseline para crearla")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regresiones = comparar(informe["resultados"], baseline, args.tolerancia)
+    if regresiones:
+        print("\nREGRESIONES DE RENDIMIENTO:")
+        for nombre, actual, referencia in regresiones:
+            print(f"  {nombre}: {actual:.1f} ops/s frente a {referencia:.1f} ops/s de referencia "
+                  f"({(1 - actual / referencia) * 100:.0f}% más lento)")
+        return 1
+    print("\nSin regresiones respecto a la referencia")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,5 @@
 import os
 import sys
-import pygame
 
 # Constantes de dimensiones
 ANCHO, ALTURA = 600, 600
@@ -28,9 +27,7 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-# Cargar imagen de corona
-corona_img_path = resource_path("corona.png")
-CORONA = pygame.transform.scale(pygame.image.load(corona_img_path), (45, 25))
+# La imagen de la corona es un recurso de dibujado: se carga bajo demanda en recursos.py
 
 def color_to_name(color):
     """Convierte un color a su nombre correspondiente"""
@@ -1,28 +1,83 @@
+import argparse
 import os
 import sys
-import pygame
 import random
 import time
 import copy
 from constantes import *
 from pieza import Pieza
 from tablero import Tablero
-from qlearning import QLearningAgent, calcular_recompensa
+from qlearning import QLearningAgent, PoliticaCheckpoint, calcular_recompensa, archivo_simetrias
+from minimax import BusquedaAlfaBeta
+from transposicion import CacheSucesores
+from motor import GEOMETRIA, num_capturadas
+from tabla_q import LRU
+from telemetria import crear_telemetria
+from solucionario import Solucionario, archivo_solucionario
+
+pygame = None  # Se importa solo al abrir una ventana (ver cargar_pygame)
+
+def cargar_pygame():
+    """Importa pygame bajo demanda para que el entrenamiento sin ventana no lo necesite"""
+    global pygame
+    if pygame is None:
+        import pygame as modulo_pygame
+        pygame = modulo_pygame
+    return pygame
+
+def crear_agente(geometria=None, memoria_q_mb=None, politica_desalojo=LRU, simetrias=False):
+    """
+    Crea el agente y carga su tabla Q. El tablero por defecto usa q_table.pkl y
+    estadisticas.pkl; otros tamaños usan archivos propios (p. ej. q_table_8x8.pkl).
+    Con memoria_q_mb la tabla Q queda limitada a esa memoria (ver TablaQCompacta).
+    Si existe q_table.qmap (o q_table_8x8.qmap...) se usa en lugar del .pkl,
+    proyectado en memoria (ver TablaQMapeada). Si existe solucionario.tab (o
+    solucionario_8x8.tab...), el agente aprende con sus valores exactos.
+    Con simetrias las posiciones simétricas comparten valores Q y la tabla usa
+    su propio archivo (q_table_simetrias.pkl, ver QLearningAgent).
+    """
+    sufijo = "" if geometria is None or geometria is GEOMETRIA else f"_{geometria.filas}x{geometria.columnas}"
+    archivo_q_table = f'q_table{sufijo}.qmap'
+    if not os.path.exists(archivo_simetrias(archivo_q_table) if simetrias else archivo_q_table):
+        archivo_q_table = f'q_table{sufijo}.pkl'
+    agente = QLearningAgent(archivo_q_table=archivo_q_table,
+                            archivo_estadisticas=f'estadisticas{sufijo}.pkl',
+                            memoria_q_mb=memoria_q_mb, politica_desalojo=politica_desalojo,
+                            simetrias=simetrias)
+    agente.load_q_table()
+    if os.path.exists(archivo_solucionario(geometria)):
+        agente.finales = Solucionario.cargar(archivo_solucionario(geometria))
+    return agente
 
 class Juego:
-    def __init__(self, ventana=True):
-        """Inicializa el juego"""
-        self.ventana = pygame.display.set_mode((ANCHO, ALTURA)) if ventana else None
+    def __init__(self, ventana=True, q_agent=None, geometria=None, busqueda=None):
+        """
+        Inicializa el juego. El agente vive más que la partida: si no se
+        proporciona uno, se crea y se carga de disco una sola vez aquí.
+        geometria fija el tamaño del tablero (por defecto, FILAS x COLUMNAS).
+        Con busqueda (una BusquedaAlfaBeta) la IA elige sus movimientos buscando
+        en lugar de consultar la tabla Q.
+        """
+        self.geometria = geometria if geometria is not None else GEOMETRIA
+        self.ventana = cargar_pygame().display.set_mode((ANCHO, ALTURA)) if ventana else None
         if self.ventana:
             pygame.display.set_caption('Damas')
         self.entrenando = False  # Variable para controlar si estamos en entrenamiento
         self.modo_evaluacion = False  # Nueva variable para controlar si estamos jugando contra humano
+        self.busqueda = busqueda  # BusquedaAlfaBeta opcional para elegir los movimientos de la IA
+        self.solucionario = None  # Solucionario opcional con la jugada exacta en posiciones con pocas piezas
+        # Movimientos por posición; se conserva entre partidas
+        self.cache_sucesores = CacheSucesores()
+        if q_agent is None:
+            q_agent = crear_agente(self.geometria)
+        self.q_agent = q_agent
+        # Fuera del entrenamiento se guarda al final de cada partida
+        self.checkpoint = PoliticaCheckpoint(self.q_agent, cada_partidas=1, cada_segundos=None)
         self._init()
-        self.tablero = Tablero()
+        self.tablero = Tablero(geometria=self.geometria)
         self.turn = BLANCO
         self.movimientos_validos = {}  
         self.selected = None
-        self.q_agent = QLearningAgent()
         self.last_state = None
         self.last_action = None
         self.game_over = False
@@ -31,17 +86,17 @@ class Juego:
         self.movimientos_sin_captura = 0
         self.capturas_blancas = 0
         self.capturas_rojas = 0
-        self.piezas_iniciales_rojas = 2
-        self.piezas_iniciales_blancas = 2
+        self.piezas_iniciales_rojas = self.tablero.ROJO_left
+        self.piezas_iniciales_blancas = self.tablero.BLANCO_left
         self.recompensa_total = 0  
 
     def _init(self):
         """Inicializa el estado del juego"""
-        self.tablero = Tablero()
+        self.tablero = Tablero(geometria=self.geometria)
         self.turn = BLANCO
         self.selected = None
         self.game_over = False
-        self.q_agent = QLearningAgent()
+        self.q_agent.nueva_partida()
         self.movimientos_totales = 0
         self.movimientos_sin_captura = 0
         self.capturas_blancas = 0
@@ -80,7 +135,7 @@ class Juego:
     def reset(self, mostrar_stats=True):
         """Reinicia el juego a su estado inicial"""
         self._init()
-        self.tablero = Tablero()
+        self.tablero = Tablero(geometria=self.geometria)
         self.turn = ROJO
         self.movimientos_validos = {}
         self.selected = None
@@ -231,25 +286,24 @@ class Juego:
             self.registrar_fin_juego("bloqueo", "derrota")
             return
 
-        # Seleccionar el mejor movimiento según Q-Learning
-        next_board = self.q_agent.get_action(current_state, movimientos_posibles)
+        # Jugada exacta si la posición está en el solucionario; si no, búsqueda alfa-beta o Q-Learning
+        movimiento = None
+        if self.solucionario:
+            movimiento = self.solucionario.mejor_movimiento(self.tablero.motor, BLANCO, self.movimientos_sin_captura)
+        if movimiento is None:
+            if self.busqueda:
+                movimiento = self.busqueda.buscar(current_state, BLANCO)["movimiento"]
+            else:
+                movimiento = self.q_agent.get_action(current_state, movimientos_posibles)
         
-        if next_board:
-            # Contar piezas antes del movimiento
-            piezas_antes = sum(1 for fil in range(FILAS) for col in range(COLUMNAS) 
-                             if current_state.get_pieza(fil, col) != 0)
-            
+        if movimiento:
             # Actualizar el tablero
-            self.tablero = next_board
+            self.tablero.make_move(movimiento)
             self.movimientos_totales += 1
             
-            # Contar piezas después del movimiento
-            piezas_despues = sum(1 for fil in range(FILAS) for col in range(COLUMNAS) 
-                               if self.tablero.get_pieza(fil, col) != 0)
-            
-            # Verificar si hubo captura
-            if piezas_antes > piezas_despues:
-                piezas_capturadas = piezas_antes - piezas_despues
+            # El movimiento indica si hubo captura
+            piezas_capturadas = num_capturadas(movimiento)
+            if piezas_capturadas:
                 self.capturas_blancas += piezas_capturadas
                 self.movimientos_sin_captura = 0
             else:
@@ -309,22 +363,14 @@ class Juego:
     def _move(self, fil, col):
         piece = self.tablero.get_pieza(self.selected.fil, self.selected.col)
         if piece != 0 and (fil, col) in self.movimientos_validos:
-            # Contar piezas antes del movimiento
-            piezas_antes = sum(1 for f in range(FILAS) for c in range(COLUMNAS) 
-                             if self.tablero.get_pieza(f, c) != 0)
-            
             # Realizar el movimiento
             skipped = self.movimientos_validos[(fil, col)]
             self.tablero.move(piece, fil, col)
             if skipped:
                 self.tablero.eliminar(skipped)
                 
-                # Contar piezas después del movimiento
-                piezas_despues = sum(1 for f in range(FILAS) for c in range(COLUMNAS) 
-                                   if self.tablero.get_pieza(f, c) != 0)
-                
-                # La diferencia es el número de piezas capturadas
-                piezas_capturadas = piezas_antes - piezas_despues
+                # Las piezas saltadas son las capturadas
+                piezas_capturadas = len(skipped)
                 
                 # Actualizar contador según el color que movió
                 if self.turn == ROJO:
@@ -343,11 +389,12 @@ class Juego:
 
     def draw_movimientos_validos(self, movimientos):
         if self.ventana:
+            tam = self.tablero.tam_casilla
             for move in movimientos:
                 fil, col = move
                 pygame.draw.circle(self.ventana, AZUL, 
-                                (col * TAM_CASILLA + TAM_CASILLA // 2, 
-                                fil * TAM_CASILLA + TAM_CASILLA // 2), 15)
+                                (col * tam + tam // 2, 
+                                fil * tam + tam // 2), min(15, tam // 4))
 
     def change_turn(self):
         self.movimientos_validos = {}
@@ -357,29 +404,19 @@ class Juego:
         else:
             self.turn = ROJO
 
+    def calcular_recompensa(self, movimiento_captura):
+        """Recompensa de la posición actual con el contador de movimientos sin captura de la partida"""
+        return calcular_recompensa(self.tablero, movimiento_captura, self.movimientos_sin_captura)
+
     def get_all_possible_moves(self, color):
-        """Obtiene todos los movimientos posibles para un color"""
-        possible_moves = []
-        for fil in range(FILAS):
-            for col in range(COLUMNAS):
-                pieza = self.tablero.get_pieza(fil, col)
-                if pieza != 0 and pieza.color == color:
-                    moves = self.tablero.get_movimientos_validos(pieza)
-                    for move, skipped in moves.items():
-                        new_board = self.tablero.simulate_move(pieza, move[0], move[1])
-                        if new_board:
-                            possible_moves.append(new_board)
-        return possible_moves
+        """
+        Obtiene todos los movimientos posibles (origen, destino, capturada) para un color.
+        La lista sale de la caché de sucesores y no debe modificarse.
+        """
+        return self.cache_sucesores.movimientos(self.tablero.motor, color)
 
     def check_blocked(self, turn):
-        for fil in range(FILAS):
-            for col in range(COLUMNAS):
-                pieza = self.tablero.get_pieza(fil, col)
-                if pieza != 0 and pieza.color == turn:
-                    movimientos = self.tablero.get_movimientos_validos(pieza)
-                    if movimientos:
-                        return False
-        return True
+        return not self.get_all_possible_moves(turn)
 
     def check_ganador(self):
         """Verifica si hay un ganador y registra las estadísticas de la partida"""
@@ -417,7 +454,7 @@ class Juego:
                     tiempo_partida=tiempo_partida,
                     recompensa_total=self.recompensa_total
                 )
-                self.q_agent.save_q_table()
+                self.checkpoint.partida_terminada()
             
             # Solo mostrar mensaje final si hay ventana (modo juego)
             if self.ventana:
@@ -440,12 +477,39 @@ class Juego:
         #print(f"Recompensa Promedio: {stats['recompensa_promedio']:.1f}")
         print("========================================")
 
-def train_ai(episodes=10000):  # Aumentado para más experiencia
-    """Entrena la IA jugando contra sí misma"""
+def train_ai(episodes=10000, q_agent=None, checkpoint_partidas=1000, checkpoint_segundos=60.0,
+             geometria=None, archivo_telemetria=None, telemetria_cada=10.0):  # Aumentado para más experiencia
+    """
+    Entrena la IA jugando contra sí misma con un único agente para todo el entrenamiento.
+    La tabla Q se guarda cada checkpoint_partidas episodios o checkpoint_segundos segundos,
+    al terminar y si el entrenamiento se interrumpe. geometria fija el tamaño del tablero.
+    Con archivo_telemetria se escribe ahí, cada telemetria_cada segundos, una línea JSON
+    con el tiempo por fase y el ritmo del entrenamiento (ver telemetria.py).
+    """
     print(f"\nIniciando entrenamiento por {episodes} episodios...")
-    game = Juego(ventana=None)  # Crear juego sin ventana para el entrenamiento
+    game = Juego(ventana=None, q_agent=q_agent, geometria=geometria)  # Crear juego sin ventana para el entrenamiento
     game.entrenando = True  # Indicar que estamos entrenando
     game.modo_evaluacion = False  # Indicar que no estamos en modo evaluación
+    game.checkpoint = PoliticaCheckpoint(game.q_agent, checkpoint_partidas, checkpoint_segundos)
+    game.checkpoint.instalar_salida()
+    escritura = game.q_agent.permitir_escritura()  # Entrenar guarda la tabla aunque venga de un .qmap
+    telemetria = crear_telemetria(archivo_telemetria, telemetria_cada)
+    telemetria.instrumentar_juego(game)
+    try:
+        _entrenar(game, episodes)
+    finally:
+        # Guardar lo pendiente aunque el entrenamiento se interrumpa
+        game.checkpoint.guardar_pendiente()
+        game.checkpoint.retirar_salida()
+        game.q_agent.permitir_escritura(escritura)
+        telemetria.cerrar()
+    
+    print("\n\nEntrenamiento completado!")
+    
+    return game.q_agent
+
+def _entrenar(game, episodes):
+    """Bucle de episodios de train_ai"""
     ultimo_progreso = 0
     
     for episode in range(episodes):
@@ -458,64 +522,63 @@ def train_ai(episodes=10000):  # Aumentado para más experiencia
             stats = game.q_agent.obtener_estadisticas()
             #print(f"\rProgreso: {progreso_actual}% - Tasa de victorias: {stats['tasa_victorias']:.1f}% - Recompensa: {stats['recompensa_promedio']:.1f}", end="")
             print(f"\rProgreso: {progreso_actual}% - Tasa de victorias: {stats['tasa_victorias']:.1f}%", end="")
-        while not game.game_over:
-            if game.turn == BLANCO:
-                game.ai_move()
-            else:
-                # La IA juega contra sí misma
-                current_state = game.tablero
-                movimientos_posibles = game.get_all_possible_moves(ROJO)
+        jugar_episodio(game, game.q_agent.learn)
+
+def jugar_episodio(game, aprender):
+    """
+    Juega una partida de autoaprendizaje sobre un juego ya reiniciado.
+    aprender recibe (state_key, action_key, reward, tablero, next_possible_actions)
+    tras cada movimiento de ROJO; en train_ai es QLearningAgent.learn.
+    """
+    while not game.game_over:
+        if game.turn == BLANCO:
+            game.ai_move()
+        else:
+            # La IA juega contra sí misma
+            current_state = game.tablero
+            movimientos_posibles = game.get_all_possible_moves(ROJO)
+            
+            if not movimientos_posibles:
+                game.registrar_fin_juego("bloqueo", "victoria")
+                break
+            
+            # Usar el mismo agente para el otro jugador
+            movimiento = game.q_agent.get_action(current_state, movimientos_posibles)
+            
+            if movimiento:
+                # Claves Q antes de modificar el tablero en el sitio
+                state_key = game.q_agent.get_state_key(current_state)
+                action_key = game.q_agent.get_action_key(current_state, movimiento)
                 
-                if not movimientos_posibles:
-                    game.registrar_fin_juego("bloqueo", "victoria")
-                    break
+                # Actualizar el tablero
+                game.tablero.make_move(movimiento)
+                game.movimientos_totales += 1
                 
-                # Usar el mismo agente para el otro jugador
-                next_board = game.q_agent.get_action(current_state, movimientos_posibles)
+                # El movimiento indica si hubo captura
+                piezas_capturadas = num_capturadas(movimiento)
+                if piezas_capturadas:
+                    game.capturas_rojas += piezas_capturadas
+                    game.movimientos_sin_captura = 0
+                else:
+                    game.movimientos_sin_captura += 1
                 
-                if next_board:
-                    # Contar piezas antes del movimiento
-                    piezas_antes = sum(1 for fil in range(FILAS) for col in range(COLUMNAS) 
-                                     if current_state.get_pieza(fil, col) != 0)
-                    
-                    # Actualizar el tablero
-                    game.tablero = next_board
-                    game.movimientos_totales += 1
-                    
-                    # Contar piezas después del movimiento
-                    piezas_despues = sum(1 for fil in range(FILAS) for col in range(COLUMNAS) 
-                                       if game.tablero.get_pieza(fil, col) != 0)
-                    
-                    # Verificar si hubo captura
-                    if piezas_antes > piezas_despues:
-                        piezas_capturadas = piezas_antes - piezas_despues
-                        game.capturas_rojas += piezas_capturadas
-                        game.movimientos_sin_captura = 0
-                    else:
-                        game.movimientos_sin_captura += 1
-                    
-                    # Calcular recompensa (ya viene invertida para el oponente)
-                    reward = calcular_recompensa(game.tablero, piezas_antes > piezas_despues, game.movimientos_sin_captura)
-                    game.recompensa_total += reward
-                    
-                    next_possible_actions = game.get_all_possible_moves(ROJO)
-                    game.q_agent.learn(current_state, next_board, reward, game.tablero, next_possible_actions)
+                # Calcular recompensa (ya viene invertida para el oponente)
+                reward = game.calcular_recompensa(piezas_capturadas > 0)
+                game.recompensa_total += reward
                 
-                game.change_turn()
+                next_possible_actions = game.get_all_possible_moves(ROJO)
+                aprender(state_key, action_key, reward, game.tablero, next_possible_actions)
             
-            # Evitar juegos infinitos - límite más flexible
-            if game.movimientos_totales > 100:  # Aumentado de 100 a 150
-                game.registrar_fin_juego("empate", "empate")
-                break
-    
-    print("\n\nEntrenamiento completado!")
-    
-    # Guardar el progreso del entrenamiento
-    game.q_agent.save_q_table()
-    
-    return game.q_agent
-
-def main():
+            game.change_turn()
+        
+        # Evitar juegos infinitos - límite más flexible
+        if game.movimientos_totales > 100:  # Aumentado de 100 a 150
+            game.registrar_fin_juego("empate", "empate")
+            break
+
+def main(busqueda_ms=None):
+    """Con busqueda_ms la IA juega contra el humano con búsqueda alfa-beta de ese tiempo por jugada"""
+    cargar_pygame()
     pygame.init()
     ventana = pygame.display.set_mode((ANCHO, ALTURA))
     pygame.display.set_caption('Damas')
@@ -525,10 +588,13 @@ def main():
     
     # Crear juego
     game = Juego(ventana=True)
+    game.solucionario = game.q_agent.finales
+    if busqueda_ms:
+        game.busqueda = BusquedaAlfaBeta(tiempo_ms=busqueda_ms, finales=game.solucionario)
     
     if train:
         # Entrenar la IA sin mostrar estadísticas
-        trained_agent = train_ai(episodes)
+        trained_agent = train_ai(episodes, game.q_agent)
         game.q_agent = trained_agent
         game.entrenando = False  # Asegurarnos de que no estamos en modo entrenamiento
         game.modo_evaluacion = True  # Indicar que estamos en modo evaluación
@@ -567,7 +633,7 @@ def main():
                 
             if event.type == pygame.MOUSEBUTTONDOWN and not game.game_over:
                 pos = pygame.mouse.get_pos()
-                row, col = get_fil_col_from_mouse(pos)
+                row, col = get_fil_col_from_mouse(pos, game.tablero.tam_casilla)
                 game.select(row, col)
                 
             # Si se presiona el botón N, nueva partida
@@ -582,9 +648,9 @@ def main():
 
 def print_board_state(tablero):
     """Imprime el estado actual del tablero en la consola"""
-    for fil in range(FILAS):
+    for fil in range(tablero.filas):
         row = []
-        for col in range(COLUMNAS):
+        for col in range(tablero.columnas):
             pieza = tablero.get_pieza(fil, col)
             if pieza == 0:
                 row.append('.')
@@ -595,11 +661,11 @@ def print_board_state(tablero):
                     row.append('R' if not pieza.king else 'Q')
         print(' '.join(row))
 
-def get_fil_col_from_mouse(pos):
+def get_fil_col_from_mouse(pos, tam_casilla=TAM_CASILLA):
     """Obtiene la fila y columna del tablero a partir de la posición del mouse"""
     x, y = pos
-    fil = y // TAM_CASILLA
-    col = x // TAM_CASILLA
+    fil = y // tam_casilla
+    col = x // tam_casilla
     return fil, col
 
 def show_training_dialog(ventana):
@@ -676,4 +742,8 @@ def show_training_dialog(ventana):
         pygame.display.update()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Damas con Q-Learning")
+    parser.add_argument("--busqueda-ms", type=int, default=None,
+                        help="la IA juega con búsqueda alfa-beta de este tiempo por jugada")
+    args = parser.parse_args()
+    main(args.busqueda_ms)
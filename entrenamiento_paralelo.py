@@ -0,0 +1,208 @@
+import os
+import time
+import queue
+import argparse
+import multiprocessing as mp
+import numpy as np
+from constantes import *
+from qlearning import QLearningAgent, PoliticaCheckpoint
+from motor import obtener_geometria
+from tabla_q import LRU, LFU
+
+
+def _trabajador(id_trabajador, episodios, q_table, semilla, resultados, politica, geometria=None, simetrias=False):
+    """
+    Proceso de autojuego sin ventana. Juega con una copia de la política,
+    envía las transiciones de cada partida al aprendiz y aplica los
+    valores Q actualizados que este difunde.
+    """
+    from damas import Juego, jugar_episodio
+
+    np.random.seed(semilla)
+    agente = QLearningAgent(simetrias=simetrias)
+    agente.q_table = q_table
+    juego = Juego(ventana=None, q_agent=agente, geometria=geometria)
+    juego.entrenando = True
+    # Los trabajadores nunca escriben en disco: eso lo hace el aprendiz
+    juego.checkpoint = PoliticaCheckpoint(agente, cada_partidas=None, cada_segundos=None)
+
+    transiciones = []
+    semillas = []
+    obtener_lote = agente.q_table.obtener_lote
+
+    def sembrar(estado, acciones, iniciales):
+        # get_best_action da valores iniciales a las acciones nuevas (1.0 a las capturas);
+        # el aprendiz repite la misma siembra antes de cada transición
+        semillas.append((estado, acciones, iniciales))
+        return obtener_lote(estado, acciones, iniciales)
+    agente.q_table.obtener_lote = sembrar
+
+    def aprender(state_key, action_key, reward, tablero, next_possible_actions):
+        claves = agente.claves_acciones(tablero, next_possible_actions)
+        next_actions = [(clave, accion[2] is not None) for clave, accion in zip(claves, next_possible_actions)]
+        transiciones.append((semillas[:], (state_key, action_key, reward, agente.get_state_key(tablero), next_actions)))
+        semillas.clear()
+
+    inicio = time.time()
+    for _ in range(episodios):
+        juego.reset(mostrar_stats=False)
+        victorias, derrotas = agente.victorias, agente.derrotas
+        transiciones = []
+        semillas.clear()
+        jugar_episodio(juego, aprender)
+        if semillas:
+            transiciones.append((semillas[:], None))
+
+        if agente.victorias > victorias:
+            resultado = "victoria"
+        elif agente.derrotas > derrotas:
+            resultado = "derrota"
+        else:
+            resultado = "empate"
+        partida = (resultado, juego.movimientos_totales, time.time() - juego.start_time, juego.recompensa_total)
+        resultados.put(('episodio', id_trabajador, transiciones, partida))
+
+        # Aplicar los valores Q difundidos desde la última partida
+        while True:
+            try:
+                cambios = politica.get_nowait()
+            except queue.Empty:
+                break
+            for (estado, accion), valor in cambios.items():
+                agente.q_table.asignar(estado, accion, valor)
+
+    resultados.put(('fin', id_trabajador, episodios, time.time() - inicio))
+
+
+def entrenar_paralelo(episodios=10000, trabajadores=None, q_agent=None, difundir_cada=50, semilla=0,
+                      checkpoint_partidas=1000, checkpoint_segundos=60.0, geometria=None,
+                      memoria_q_mb=None, politica_desalojo=LRU, simetrias=False):
+    """
+    Entrena con varios procesos de autojuego y un único aprendiz (este proceso).
+    Los trabajadores juegan con una instantánea de la tabla Q y envían transiciones
+    (estado, acción, recompensa, estado siguiente); el aprendiz aplica
+    QLearningAgent.learn_claves y cada difundir_cada partidas reenvía
+    a todos los trabajadores los valores Q modificados.
+    geometria fija el tamaño del tablero (por defecto, FILAS x COLUMNAS).
+    memoria_q_mb limita la tabla Q del aprendiz y de cada trabajador.
+    simetrias hace que las posiciones simétricas compartan valores Q (ver
+    QLearningAgent.get_state_key); con q_agent se usa la opción del agente.
+    Returns:
+        (agente, rendimiento) con episodios por segundo de cada trabajador y del total
+    """
+    trabajadores = max(1, min(trabajadores or os.cpu_count() or 1, episodios))
+    if q_agent is None:
+        from damas import crear_agente
+        q_agent = crear_agente(geometria, memoria_q_mb, politica_desalojo, simetrias)
+    checkpoint = PoliticaCheckpoint(q_agent, checkpoint_partidas, checkpoint_segundos)
+    checkpoint.instalar_salida()
+    escritura = q_agent.permitir_escritura()  # El aprendiz guarda la tabla aunque venga de un .qmap
+
+    print(f"\nIniciando entrenamiento paralelo por {episodios} episodios con {trabajadores} procesos...")
+    contexto = mp.get_context()
+    resultados = contexto.Queue()
+    politicas = [contexto.Queue() for _ in range(trabajadores)]
+    procesos = []
+    for i in range(trabajadores):
+        reparto = episodios // trabajadores + (1 if i < episodios % trabajadores else 0)
+        proceso = contexto.Process(target=_trabajador,
+                                   args=(i, reparto, q_agent.q_table, semilla + i, resultados, politicas[i],
+                                         geometria, q_agent.simetrias),
+                                   daemon=True)
+        proceso.start()
+        procesos.append(proceso)
+
+    inicio = time.time()
+    rendimiento = {}
+    cambios = {}
+    completados = 0
+    ultimo_progreso = 0
+    try:
+        while len(rendimiento) < trabajadores:
+            try:
+                mensaje = resultados.get(timeout=1.0)
+            except queue.Empty:
+                caidos = [p for i, p in enumerate(procesos) if i not in rendimiento and p.exitcode not in (None, 0)]
+                if caidos:
+                    raise RuntimeError(f"Un proceso de entrenamiento terminó con código {caidos[0].exitcode}")
+                continue
+
+            if mensaje[0] == 'episodio':
+                _, id_trabajador, transiciones, partida = mensaje
+                for semillas, transicion in transiciones:
+                    for estado, acciones, iniciales in semillas:
+                        q_agent.q_table.obtener_lote(estado, acciones, iniciales)
+                    if transicion is None:
+                        continue
+                    state_key, action_key, reward, next_state_key, next_actions = transicion
+                    q_agent.learn_claves(state_key, action_key, reward, next_state_key, next_actions)
+                    cambios[(state_key, action_key)] = q_agent.q_table.consultar(state_key, action_key)
+                q_agent.registrar_partida(*partida)
+                checkpoint.partida_terminada()
+                completados += 1
+
+                if completados % difundir_cada == 0 and cambios:
+                    for i, cola in enumerate(politicas):
+                        if i not in rendimiento:
+                            cola.put(cambios)
+                    cambios = {}
+
+                progreso_actual = (completados * 100) // episodios
+                if progreso_actual > ultimo_progreso:
+                    ultimo_progreso = progreso_actual
+                    stats = q_agent.obtener_estadisticas()
+                    print(f"\rProgreso: {progreso_actual}% - Tasa de victorias: {stats['tasa_victorias']:.1f}%", end="")
+            else:
+                _, id_trabajador, jugados, duracion = mensaje
+                rendimiento[id_trabajador] = {
+                    "episodios": jugados,
+                    "segundos": duracion,
+                    "episodios_por_segundo": jugados / duracion if duracion > 0 else 0.0
+                }
+    finally:
+        for cola in politicas:
+            cola.cancel_join_thread()
+        for proceso in procesos:
+            proceso.join(timeout=5)
+            if proceso.is_alive():
+                proceso.terminate()
+        checkpoint.guardar_pendiente()
+        checkpoint.retirar_salida()
+        q_agent.permitir_escritura(escritura)
+
+    duracion = time.time() - inicio
+    rendimiento["total"] = {
+        "episodios": completados,
+        "segundos": duracion,
+        "episodios_por_segundo": completados / duracion if duracion > 0 else 0.0
+    }
+
+    print("\n\nEntrenamiento completado!")
+    for id_trabajador in range(trabajadores):
+        datos = rendimiento[id_trabajador]
+        print(f"Proceso {id_trabajador}: {datos['episodios']} episodios, {datos['episodios_por_segundo']:.1f} episodios/s")
+    print(f"Total: {rendimiento['total']['episodios_por_segundo']:.1f} episodios/s")
+    return q_agent, rendimiento
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entrenamiento paralelo por autojuego")
+    parser.add_argument("--episodios", type=int, default=10000)
+    parser.add_argument("--trabajadores", type=int, default=None, help="por defecto, un proceso por núcleo")
+    parser.add_argument("--difundir-cada", type=int, default=50, help="partidas entre envíos de la política")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--filas", type=int, default=FILAS)
+    parser.add_argument("--columnas", type=int, default=COLUMNAS)
+    parser.add_argument("--filas-iniciales", type=int, default=None,
+                        help="filas con peones de cada bando al empezar (por defecto, según el tamaño)")
+    parser.add_argument("--memoria-q-mb", type=float, default=None,
+                        help="memoria máxima de la tabla Q; al llenarse desaloja entradas (por defecto, sin límite)")
+    parser.add_argument("--politica-desalojo", choices=[LRU, LFU], default=LRU,
+                        help="lru: menos visitadas recientemente; lfu: menos visitas")
+    parser.add_argument("--simetrias", action="store_true",
+                        help="las posiciones simétricas comparten sus valores Q")
+    args = parser.parse_args()
+    entrenar_paralelo(args.episodios, args.trabajadores, difundir_cada=args.difundir_cada, semilla=args.semilla,
+                      geometria=obtener_geometria(args.filas, args.columnas, args.filas_iniciales),
+                      memoria_q_mb=args.memoria_q_mb, politica_desalojo=args.politica_desalojo,
+                      simetrias=args.simetrias)
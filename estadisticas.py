@@ -0,0 +1,115 @@
+"""
+Estadísticas de partidas en memoria acotada: agregados que se actualizan en O(1)
+por partida (media y varianza de Welford, mínimo y máximo) más un búfer circular
+con las últimas partidas, en lugar de listas con el historial completo.
+"""
+import math
+from collections import deque
+import numpy as np
+
+PARTIDAS_RECIENTES = 100  # Partidas que se guardan una a una
+MAX_HISTOGRAMAS = 100     # Instantáneas de histograma que se conservan
+
+
+class Acumulador:
+    """Número de valores, media, varianza, mínimo y máximo de una serie, sin guardarla"""
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0  # Suma de cuadrados de las diferencias con la media (Welford)
+        self.minimo = None
+        self.maximo = None
+
+    def agregar(self, valor):
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (valor - self.media)
+        self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+        self.maximo = valor if self.maximo is None else max(self.maximo, valor)
+
+    def varianza(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def desviacion(self):
+        return math.sqrt(self.varianza())
+
+    def a_dict(self):
+        return {"n": self.n, "media": self.media, "m2": self.m2, "minimo": self.minimo, "maximo": self.maximo}
+
+    @classmethod
+    def desde_dict(cls, datos):
+        acumulador = cls()
+        acumulador.n, acumulador.media, acumulador.m2 = datos["n"], datos["media"], datos["m2"]
+        acumulador.minimo, acumulador.maximo = datos["minimo"], datos["maximo"]
+        return acumulador
+
+    @classmethod
+    def desde_lista(cls, valores):
+        """Acumulador equivalente a haber agregado los valores uno a uno (historiales antiguos)"""
+        acumulador = cls()
+        for valor in valores:
+            acumulador.agregar(valor)
+        return acumulador
+
+
+class EstadisticasPartidas:
+    """
+    Recompensa y número de movimientos de cada partida: agregados de todas
+    y valores de las PARTIDAS_RECIENTES últimas. Con histograma_cada, cada
+    tantas partidas guarda un histograma de las recompensas recientes.
+    """
+    def __init__(self, recientes=PARTIDAS_RECIENTES, histograma_cada=None, intervalos_histograma=10):
+        self.recompensas = Acumulador()
+        self.movimientos = Acumulador()
+        self.ultimas_recompensas = deque(maxlen=recientes)
+        self.ultimos_movimientos = deque(maxlen=recientes)
+        self.histograma_cada = histograma_cada
+        self.intervalos_histograma = intervalos_histograma
+        self.histogramas = deque(maxlen=MAX_HISTOGRAMAS)
+
+    def registrar(self, num_movimientos, recompensa_total):
+        self.recompensas.agregar(recompensa_total)
+        self.movimientos.agregar(num_movimientos)
+        self.ultimas_recompensas.append(recompensa_total)
+        self.ultimos_movimientos.append(num_movimientos)
+        if self.histograma_cada and self.recompensas.n % self.histograma_cada == 0:
+            self.histogramas.append(self.histograma())
+
+    def histograma(self):
+        """Histograma de las recompensas recientes: {partida, conteos, limites}"""
+        conteos, limites = np.histogram(list(self.ultimas_recompensas), bins=self.intervalos_histograma)
+        return {"partida": self.recompensas.n, "conteos": conteos.tolist(), "limites": limites.tolist()}
+
+    def a_dict(self):
+        return {
+            "recompensas": self.recompensas.a_dict(),
+            "movimientos": self.movimientos.a_dict(),
+            "ultimas_recompensas": list(self.ultimas_recompensas),
+            "ultimos_movimientos": list(self.ultimos_movimientos),
+            "histogramas": list(self.histogramas)
+        }
+
+    def cargar_dict(self, datos):
+        """Carga el formato de a_dict o el antiguo de estadisticas.pkl (listas historial_*)"""
+        if "historial_recompensas" in datos:
+            recompensas, movimientos = datos["historial_recompensas"], datos["historial_movimientos"]
+            self.recompensas = Acumulador.desde_lista(recompensas)
+            self.movimientos = Acumulador.desde_lista(movimientos)
+            histogramas = []
+        else:
+            recompensas, movimientos = datos["ultimas_recompensas"], datos["ultimos_movimientos"]
+            self.recompensas = Acumulador.desde_dict(datos["recompensas"])
+            self.movimientos = Acumulador.desde_dict(datos["movimientos"])
+            histogramas = datos.get("histogramas", [])
+        self.ultimas_recompensas.clear()
+        self.ultimas_recompensas.extend(recompensas[-self.ultimas_recompensas.maxlen:])
+        self.ultimos_movimientos.clear()
+        self.ultimos_movimientos.extend(movimientos[-self.ultimos_movimientos.maxlen:])
+        self.histogramas.clear()
+        self.histogramas.extend(histogramas)
+
+    def ultimas(self, n=10):
+        """Últimas n recompensas y números de movimientos"""
+        inicio = max(0, len(self.ultimas_recompensas) - n)
+        return (list(self.ultimas_recompensas)[inicio:], list(self.ultimos_movimientos)[inicio:])
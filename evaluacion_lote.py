@@ -0,0 +1,147 @@
+"""
+Evaluación por lotes con NumPy: codifica N posiciones del mismo tamaño como planos
+de 0/1 (peones y reyes de cada color) y calcula para todas a la vez la puntuación
+de evaluate_board y la recompensa de calcular_recompensa.
+
+Es una utilidad independiente: el juego y el entrenamiento evalúan posición a
+posición; la usan perft.py --verificar (contra las funciones escalares) y benchmarks.py.
+"""
+import numpy as np
+from constantes import *
+from motor import UNIDADES_POR_PUNTO, num_capturadas
+from qlearning import VALOR_VICTORIA
+
+PEONES_BLANCOS, REYES_BLANCOS, PEONES_ROJOS, REYES_ROJOS = range(4)
+
+_tablas = {}
+
+
+class TablasLote:
+    """Índices y pesos por casilla de una geometría, en arrays de NumPy"""
+    def __init__(self, geometria):
+        self.geometria = geometria
+        filas, columnas = geometria.filas, geometria.columnas
+        posiciones = np.array(geometria.posiciones, dtype=np.int64).reshape(-1, 2)
+        self.fil = posiciones[:, 0]
+        self.col = posiciones[:, 1]
+        # Material y avance de evaluate_board (en UNIDADES_POR_PUNTO), una columna por tipo de pieza
+        self.puntos = np.array(geometria.puntos, dtype=np.int64)
+        # Términos de calcular_recompensa para los peones y reyes rojos
+        self.avance_rojo = (filas - self.fil - 1) * 5 + np.where(self.fil >= filas - 2, 20, 0)
+        self.centro = np.where((self.fil >= 1) & (self.fil <= filas - 2) &
+                               (self.col >= 1) & (self.col <= columnas - 2), 15, 0)
+        # Por dirección: (avance de fila, origen->paso y origen->paso->salto como arrays de índices)
+        self.direcciones = []
+        for df, desplazamiento, con_paso, con_salto in geometria.desplazamientos:
+            origen_paso = np.array([i for i in range(geometria.n) if con_paso >> i & 1], dtype=np.int64)
+            origen_salto = np.array([i for i in range(geometria.n) if con_salto >> i & 1], dtype=np.int64)
+            self.direcciones.append((df, origen_paso, origen_paso + desplazamiento,
+                                     origen_salto, origen_salto + desplazamiento,
+                                     origen_salto + 2 * desplazamiento))
+
+
+def obtener_tablas(geometria):
+    if geometria not in _tablas:
+        _tablas[geometria] = TablasLote(geometria)
+    return _tablas[geometria]
+
+
+def codificar(motores):
+    """
+    Codifica una o más posiciones del mismo tamaño en un array (N, 4, casillas) de 0/1
+    con los planos de peones blancos, reyes blancos, peones rojos y reyes rojos
+    """
+    n = motores[0].geometria.n
+    num_bytes = (n + 7) // 8
+    datos = b''.join(bitboard.to_bytes(num_bytes, 'little')
+                     for motor in motores
+                     for bitboard in (motor.blancas, motor.blancas_reyes, motor.rojas, motor.rojas_reyes))
+    planos = np.frombuffer(datos, dtype=np.uint8).reshape(len(motores), 4, num_bytes)
+    return np.unpackbits(planos, axis=2, bitorder='little')[:, :, :n]
+
+
+def movilidad(planos, tablas, color):
+    """Número de movimientos de color en cada posición (igual que Motor.movilidad)"""
+    planos = planos.astype(bool)
+    if color == BLANCO:
+        peones, reyes = planos[:, PEONES_BLANCOS], planos[:, REYES_BLANCOS]
+        rivales = planos[:, PEONES_ROJOS] | planos[:, REYES_ROJOS]
+        sentido = 1
+    else:
+        peones, reyes = planos[:, PEONES_ROJOS], planos[:, REYES_ROJOS]
+        rivales = planos[:, PEONES_BLANCOS] | planos[:, REYES_BLANCOS]
+        sentido = -1
+    vacias = ~(peones | reyes | rivales)
+    total = np.zeros(len(planos), dtype=np.int64)
+    for df, origen_paso, paso, origen_salto, intermedia, salto in tablas.direcciones:
+        piezas = peones | reyes if df == sentido else reyes
+        total += (piezas[:, origen_paso] & vacias[:, paso]).sum(axis=1)
+        total += (piezas[:, origen_salto] & rivales[:, intermedia] & vacias[:, salto]).sum(axis=1)
+    return total
+
+
+def evaluar(planos, geometria):
+    """Puntuación de evaluate_board para cada posición del lote (punto de vista de BLANCO)"""
+    tablas = obtener_tablas(geometria)
+    puntos = np.einsum('ntc,ct->n', planos.astype(np.int64), tablas.puntos)
+    puntos += movilidad(planos, tablas, BLANCO) - movilidad(planos, tablas, ROJO)
+    return puntos / UNIDADES_POR_PUNTO
+
+
+def recompensas(planos, geometria, movimiento_captura, movimientos_sin_captura):
+    """
+    calcular_recompensa para cada posición del lote. movimiento_captura y
+    movimientos_sin_captura pueden ser escalares o arrays de longitud N.
+    """
+    tablas = obtener_tablas(geometria)
+    planos = planos.astype(np.int64)
+    captura = np.asarray(movimiento_captura, dtype=bool)
+    sin_captura = np.asarray(movimientos_sin_captura, dtype=np.int64)
+
+    piezas_rojas = planos[:, PEONES_ROJOS].sum(axis=1) + planos[:, REYES_ROJOS].sum(axis=1)
+    piezas_blancas = planos[:, PEONES_BLANCOS].sum(axis=1) + planos[:, REYES_BLANCOS].sum(axis=1)
+    reyes_rojos = planos[:, REYES_ROJOS].sum(axis=1)
+    reyes_blancos = planos[:, REYES_BLANCOS].sum(axis=1)
+
+    recompensa = (piezas_rojas - piezas_blancas) * 25
+    recompensa += (reyes_rojos - reyes_blancos) * 40
+    recompensa += np.where(captura, 50 + np.where(sin_captura < 5, 30, 0), 0)
+    recompensa -= np.where(sin_captura > 5, (sin_captura - 5) * 10, 0)
+    recompensa += planos[:, PEONES_ROJOS] @ tablas.avance_rojo
+    recompensa += planos[:, REYES_ROJOS] @ tablas.centro
+
+    victoria = (piezas_rojas > 0) & (piezas_blancas == 0)
+    recompensa += np.where(victoria, VALOR_VICTORIA + np.where(sin_captura < 20, (20 - sin_captura) * 5, 0)
+                           + np.where(piezas_rojas >= 2, piezas_rojas * 20, 0), 0)
+    derrota = (piezas_rojas == 0) & (piezas_blancas > 0)
+    recompensa -= np.where(derrota, VALOR_VICTORIA + piezas_blancas * 10, 0)
+    recompensa -= np.where(sin_captura >= 10, (sin_captura - 9) * 15, 0)
+    return -recompensa
+
+
+def sucesores(tablero, movimientos):
+    """Planos de las posiciones que resultan de cada movimiento"""
+    motor = tablero.motor
+    if not movimientos:
+        return np.zeros((0, 4, motor.geometria.n), dtype=np.uint8)
+    siguientes = []
+    for movimiento in movimientos:
+        deshacer = motor.hacer_movimiento(movimiento)
+        siguientes.append(motor.copiar())
+        motor.deshacer_movimiento(deshacer)
+    return codificar(siguientes)
+
+
+def evaluar_sucesores(tablero, movimientos):
+    """evaluate_board de la posición tras cada movimiento, en una sola llamada"""
+    return evaluar(sucesores(tablero, movimientos), tablero.geometria)
+
+
+def recompensas_sucesores(tablero, movimientos, movimientos_sin_captura):
+    """
+    Recompensa de cada movimiento candidato como la calcula jugar_episodio:
+    una captura reinicia el contador de movimientos sin captura y si no, suma uno
+    """
+    captura = np.array([num_capturadas(movimiento) > 0 for movimiento in movimientos], dtype=bool)
+    sin_captura = np.where(captura, 0, movimientos_sin_captura + 1)
+    return recompensas(sucesores(tablero, movimientos), tablero.geometria, captura, sin_captura)
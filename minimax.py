@@ -1,62 +1,293 @@
-from copy import deepcopy
+import time
 from constantes import *
+from transposicion import TablaTransposicion, EXACTA, INFERIOR, SUPERIOR
 
 def evaluate_board(tablero):
-    score = 0
-    for fil in range(FILAS):
-        for col in range(COLUMNAS):
-            pieza = tablero.get_pieza(fil, col)
-            if pieza != 0:
-                # Valor de la pieza
-                if pieza.color == BLANCO:
-                    score += 1
-                    if pieza.king:
-                        score += 2  # Aumentar valor de las damas
-                else:
-                    score -= 1
-                    if pieza.king:
-                        score -= 2  # Aumentar valor de las damas
-                
-                # Valor basado en la posición
-                if pieza.color == BLANCO:
-                    score += (FILAS - fil) * 0.1  # Aumentar valor al acercarse al otro lado
-                else:
-                    score -= fil * 0.1  # Aumentar valor al acercarse al otro lado
-                
-                # Valor basado en la movilidad
-                movimientos = tablero.get_movimientos_validos(pieza)
-                score += len(movimientos) * 0.05 if pieza.color == BLANCO else -len(movimientos) * 0.05
-    return score
-
-def minimax(tablero, profundidad, maximizando_jugador):
+    """
+    Material, avance y movilidad desde el punto de vista de BLANCO.
+    El material y el avance los mantiene el motor en cada movimiento y la
+    movilidad se cuenta con operaciones de bits (ver Motor.evaluar).
+    """
+    return tablero.motor.evaluar()
+
+def minimax(tablero, profundidad, maximizando_jugador, finales=None):
+    """finales es un Solucionario opcional: las posiciones que contiene no se exploran"""
     if profundidad == 0 or tablero.ganador() is not None:
         return evaluate_board(tablero)
+    if finales is not None:
+        puntuacion = puntuacion_final(finales, tablero, BLANCO if maximizando_jugador else ROJO)
+        if puntuacion is not None:
+            return puntuacion if maximizando_jugador else -puntuacion
     
     if maximizando_jugador:
         max_eval = float('-inf')
         for movimiento in obtener_movimientos_posibles(tablero, BLANCO):
-            evaluacion = minimax(movimiento, profundidad - 1, False)
+            deshacer = tablero.make_move(movimiento)
+            evaluacion = minimax(tablero, profundidad - 1, False, finales)
+            tablero.unmake_move(deshacer)
             max_eval = max(max_eval, evaluacion)
         return max_eval
     else:
         min_eval = float('inf')
         for movimiento in obtener_movimientos_posibles(tablero, ROJO):
-            evaluacion = minimax(movimiento, profundidad - 1, True)
+            deshacer = tablero.make_move(movimiento)
+            evaluacion = minimax(tablero, profundidad - 1, True, finales)
+            tablero.unmake_move(deshacer)
             min_eval = min(min_eval, evaluacion)
         return min_eval
 
 def obtener_movimientos_posibles(tablero, color):
-    movimientos = []
-    for fil in range(FILAS):
-        for col in range(COLUMNAS):
-            pieza = tablero.get_pieza(fil, col)
-            if pieza != 0 and pieza.color == color:
-                movimientos_validos = tablero.get_movimientos_validos(pieza)
-                for move, skipped in movimientos_validos.items():
-                    new_tablero = deepcopy(tablero)
-                    new_pieza = new_tablero.get_pieza(pieza.fil, pieza.col)
-                    new_tablero.move(new_pieza, move[0], move[1])
-                    if skipped:
-                        new_tablero.eliminar(skipped)
-                    movimientos.append(new_tablero)
-    return movimientos
+    """Movimientos (origen, destino, capturada) para aplicar con make_move/unmake_move"""
+    return tablero.get_movimientos(color)
+
+# Puntuación de victoria para la búsqueda alfa-beta (muy por encima de evaluate_board)
+VICTORIA = 1000
+MAX_PLY = 64
+# Victoria conocida por el solucionario: por debajo de las victorias encontradas
+# en la búsqueda y por encima de cualquier evaluación
+VICTORIA_FINAL = VICTORIA - 2 * MAX_PLY
+
+
+def puntuacion_final(finales, tablero, color):
+    """
+    Puntuación exacta desde el punto de vista de color según el solucionario
+    (antes gana cuanto menos movimientos sin captura le falten), o None si la
+    posición no está en sus tablas. La búsqueda no lleva la cuenta de
+    movimientos sin captura, así que se consulta con el contador a cero.
+    """
+    resultado = finales.consultar(tablero.motor, color)
+    if resultado is None:
+        return None
+    resultado, distancia = resultado
+    if resultado == 'victoria':
+        return VICTORIA_FINAL - distancia
+    if resultado == 'derrota':
+        return distancia - VICTORIA_FINAL
+    return 0
+
+
+class TiempoAgotado(Exception):
+    """Se lanza dentro de la búsqueda cuando se acaba el presupuesto de tiempo"""
+
+
+class BusquedaAlfaBeta:
+    """
+    Búsqueda alfa-beta (negamax) con profundización iterativa y límite de tiempo.
+    Ordena los movimientos con el de la tabla de transposición, la variante
+    principal anterior, capturas, movimientos killer y la heurística de historia.
+    """
+    def __init__(self, profundidad_maxima=8, tiempo_ms=1000, memoria_tt_mb=16, finales=None):
+        """Con finales (un Solucionario) las posiciones de sus tablas se puntúan sin buscar"""
+        self.profundidad_maxima = profundidad_maxima
+        self.tiempo_ms = tiempo_ms
+        self.tt = TablaTransposicion(memoria_tt_mb) if memoria_tt_mb else None
+        self.finales = finales
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.historia = {}
+        self.nodos = 0
+        self.cortes_finales = 0
+        self.limite = None
+        self.variante_previa = []
+
+    def buscar(self, tablero, color, profundidad_maxima=None, tiempo_ms=None):
+        """
+        Busca el mejor movimiento para color.
+        Returns:
+            dict con el movimiento, la puntuación (desde el punto de vista de color),
+            la variante principal, la profundidad completada, nodos, nodos
+            resueltos con el solucionario y tiempo
+        """
+        profundidad_maxima = profundidad_maxima or self.profundidad_maxima
+        tiempo_ms = tiempo_ms if tiempo_ms is not None else self.tiempo_ms
+        inicio = time.perf_counter()
+        self.limite = inicio + tiempo_ms / 1000 if tiempo_ms else None
+        self.nodos = 0
+        self.cortes_finales = 0
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.variante_previa = []
+        if self.tt:
+            self.tt.nueva_busqueda()
+
+        # Se busca sobre una copia para que cortar por tiempo no deje el tablero a medias
+        tablero = tablero.copiar()
+        movimientos = tablero.get_movimientos(color)
+        resultado = {
+            "movimiento": movimientos[0] if movimientos else None,
+            "puntuacion": 0,
+            "variante_principal": movimientos[:1],
+            "profundidad": 0,
+            "nodos": 0,
+            "cortes_finales": 0,
+            "tiempo": 0.0
+        }
+        if len(movimientos) <= 1:
+            return resultado
+
+        for profundidad in range(1, profundidad_maxima + 1):
+            try:
+                puntuacion, variante = self.negamax(tablero, profundidad, 0, -float('inf'), float('inf'), color)
+            except TiempoAgotado:
+                break
+            variante = self.completar_variante(tablero, color, variante, profundidad)
+            self.variante_previa = variante
+            resultado["movimiento"] = variante[0]
+            resultado["puntuacion"] = puntuacion
+            resultado["variante_principal"] = variante
+            resultado["profundidad"] = profundidad
+            # Victoria o derrota forzada: no hace falta profundizar más
+            if abs(puntuacion) >= VICTORIA - MAX_PLY:
+                break
+
+        resultado["nodos"] = self.nodos
+        resultado["cortes_finales"] = self.cortes_finales
+        resultado["tiempo"] = time.perf_counter() - inicio
+        return resultado
+
+    def negamax(self, tablero, profundidad, ply, alfa, beta, color):
+        self.nodos += 1
+        if self.limite is not None and not self.nodos & 255 and time.perf_counter() > self.limite:
+            raise TiempoAgotado()
+
+        rival = ROJO if color == BLANCO else BLANCO
+        ganador = tablero.ganador()
+        if ganador is not None:
+            return (VICTORIA - ply if ganador == color else ply - VICTORIA), []
+        # Resultado exacto del solucionario (no en la raíz, que siempre debe dar un movimiento)
+        if self.finales is not None and ply > 0:
+            puntuacion = puntuacion_final(self.finales, tablero, color)
+            if puntuacion is not None:
+                self.cortes_finales += 1
+                return puntuacion, []
+        if profundidad == 0 or ply >= MAX_PLY - 1:
+            signo = 1 if color == BLANCO else -1
+            return signo * evaluate_board(tablero), []
+
+        # Consultar la tabla de transposición (no en la raíz, que siempre debe dar un movimiento)
+        clave = None
+        movimiento_tt = None
+        if self.tt:
+            clave = tablero.motor.clave_zobrist(color)
+            entrada = self.tt.buscar(clave)
+            if entrada is not None:
+                profundidad_tt, puntuacion_tt, tipo_tt, movimiento_tt = entrada
+                if ply > 0 and profundidad_tt >= profundidad:
+                    puntuacion_tt = puntuacion_desde_tt(puntuacion_tt, ply)
+                    variante_tt = [movimiento_tt] if movimiento_tt else []
+                    if tipo_tt == EXACTA:
+                        return puntuacion_tt, variante_tt
+                    if tipo_tt == INFERIOR and puntuacion_tt >= beta:
+                        return puntuacion_tt, variante_tt
+                    if tipo_tt == SUPERIOR and puntuacion_tt <= alfa:
+                        return puntuacion_tt, variante_tt
+
+        movimientos = tablero.get_movimientos(color)
+        if not movimientos:
+            # Un jugador bloqueado pierde la partida
+            return ply - VICTORIA, []
+
+        alfa_original = alfa
+        mejor, mejor_variante = -float('inf'), []
+        for movimiento in self.ordenar(movimientos, ply, movimiento_tt):
+            deshacer = tablero.make_move(movimiento)
+            puntuacion, variante = self.negamax(tablero, profundidad - 1, ply + 1, -beta, -alfa, rival)
+            tablero.unmake_move(deshacer)
+            puntuacion = -puntuacion
+            if puntuacion > mejor:
+                mejor, mejor_variante = puntuacion, [movimiento] + variante
+            if puntuacion > alfa:
+                alfa = puntuacion
+            if alfa >= beta:
+                if movimiento[2] is None:
+                    self.registrar_corte(movimiento, profundidad, ply)
+                break
+
+        if self.tt:
+            if mejor <= alfa_original:
+                tipo = SUPERIOR
+            elif mejor >= beta:
+                tipo = INFERIOR
+            else:
+                tipo = EXACTA
+            self.tt.guardar(clave, profundidad, puntuacion_a_tt(mejor, ply), tipo, mejor_variante[0])
+        return mejor, mejor_variante
+
+    def completar_variante(self, tablero, color, variante, profundidad):
+        """
+        Un acierto de la tabla de transposición corta la variante en su movimiento;
+        se alarga siguiendo los movimientos de las entradas exactas de la tabla
+        """
+        if not self.tt or len(variante) >= profundidad:
+            return variante
+        variante = list(variante)
+        pila = []
+        for movimiento in variante:
+            pila.append(tablero.make_move(movimiento))
+            color = ROJO if color == BLANCO else BLANCO
+        vistas = set()
+        while len(variante) < profundidad and tablero.ganador() is None:
+            clave = tablero.motor.clave_zobrist(color)
+            if clave in vistas:
+                break
+            vistas.add(clave)
+            entrada = self.tt.consultar(clave)
+            if entrada is None or entrada[2] != EXACTA:
+                break
+            movimiento = entrada[3]
+            if movimiento not in tablero.get_movimientos(color):
+                break
+            variante.append(movimiento)
+            pila.append(tablero.make_move(movimiento))
+            color = ROJO if color == BLANCO else BLANCO
+        for deshacer in reversed(pila):
+            tablero.unmake_move(deshacer)
+        return variante
+
+    def ordenar(self, movimientos, ply, movimiento_tt=None):
+        """Movimiento de la tabla, variante principal, capturas, killers y después historia"""
+        pv = self.variante_previa[ply] if ply < len(self.variante_previa) else None
+        killers = self.killers[ply]
+        historia = self.historia
+
+        def prioridad(movimiento):
+            if movimiento == movimiento_tt:
+                return 4000000
+            if movimiento == pv:
+                return 3000000
+            if movimiento[2] is not None:
+                return 2000000
+            if movimiento == killers[0] or movimiento == killers[1]:
+                return 1000000
+            return historia.get((movimiento[0], movimiento[1]), 0)
+
+        return sorted(movimientos, key=prioridad, reverse=True)
+
+    def registrar_corte(self, movimiento, profundidad, ply):
+        """Actualiza killers e historia con un movimiento tranquilo que produjo corte"""
+        killers = self.killers[ply]
+        if killers[0] != movimiento:
+            killers[1] = killers[0]
+            killers[0] = movimiento
+        clave = (movimiento[0], movimiento[1])
+        self.historia[clave] = self.historia.get(clave, 0) + profundidad * profundidad
+
+
+def puntuacion_a_tt(puntuacion, ply):
+    """Las victorias se guardan relativas al nodo y no a la raíz"""
+    if puntuacion >= VICTORIA - MAX_PLY:
+        return puntuacion + ply
+    if puntuacion <= MAX_PLY - VICTORIA:
+        return puntuacion - ply
+    return puntuacion
+
+
+def puntuacion_desde_tt(puntuacion, ply):
+    if puntuacion >= VICTORIA - MAX_PLY:
+        return puntuacion - ply
+    if puntuacion <= MAX_PLY - VICTORIA:
+        return puntuacion + ply
+    return puntuacion
+
+
+def mejor_movimiento(tablero, color, profundidad_maxima=8, tiempo_ms=1000, finales=None):
+    """Atajo para obtener el mejor movimiento con una búsqueda alfa-beta nueva"""
+    return BusquedaAlfaBeta(profundidad_maxima, tiempo_ms, finales=finales).buscar(tablero, color)
@@ -0,0 +1,575 @@
+import random
+from constantes import *
+
+# Direcciones de movimiento en el mismo orden que usa Tablero.get_movimientos_validos
+DIRECCIONES_REY = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+DIRECCIONES_ROJO = [(-1, -1), (-1, 1)]    # Hacia arriba
+DIRECCIONES_BLANCO = [(1, -1), (1, 1)]    # Hacia abajo
+
+
+if hasattr(int, 'bit_count'):
+    contar_bits = int.bit_count
+else:
+    def contar_bits(x):
+        """Número de bits a 1 (compatible con Python < 3.10)"""
+        return bin(x).count('1')
+
+# La evaluación se lleva en enteros, en vigésimas de punto, para que hacer y deshacer
+# movimientos no acumule error de redondeo: peón 1 (20), rey 3 (60), cada fila de
+# avance 0.1 (2) y cada movimiento disponible 0.05 (1)
+UNIDADES_POR_PUNTO = 20
+
+
+def num_capturadas(movimiento):
+    """Piezas que captura un movimiento (origen, destino, capturada): los saltos son simples"""
+    return 0 if movimiento[2] is None else 1
+
+
+class Geometria:
+    """
+    Dimensiones del tablero y todo lo que depende de ellas: filas de coronación,
+    posición inicial y claves Zobrist. Hay una sola instancia por tamaño
+    (ver obtener_geometria), compartida por todos los motores de ese tamaño.
+    El bit i corresponde a la casilla (i // columnas, i % columnas).
+    """
+    def __init__(self, filas=FILAS, columnas=COLUMNAS, filas_iniciales=None):
+        if filas_iniciales is None:
+            filas_iniciales = max(1, (filas - 2) // 2)
+        if filas < 3 or columnas < 2 or filas_iniciales < 1 or 2 * filas_iniciales >= filas:
+            raise ValueError(f"Tablero no válido: {filas}x{columnas} con {filas_iniciales} filas iniciales")
+        self.filas = filas
+        self.columnas = columnas
+        self.filas_iniciales = filas_iniciales
+        self.n = filas * columnas
+
+        # Casillas oscuras (las jugables) y posición inicial de cada bando
+        self.oscuras = 0
+        self.inicial_blancas = 0
+        self.inicial_rojas = 0
+        for fil in range(filas):
+            for col in range(columnas):
+                if col % 2 == ((fil + 1) % 2):
+                    bit = 1 << self.casilla(fil, col)
+                    self.oscuras |= bit
+                    if fil < filas_iniciales:
+                        self.inicial_blancas |= bit
+                    elif fil >= filas - filas_iniciales:
+                        self.inicial_rojas |= bit
+
+        # Filas donde corona un peón (la primera y la última)
+        self.coronacion = (1 << columnas) - 1 | ((1 << columnas) - 1) << (filas - 1) * columnas
+
+        # Tablas de vecinos: para cada casilla, pares (paso, salto) por dirección en el
+        # orden de DIRECCIONES_*. Solo se incluyen direcciones cuyo paso está dentro del
+        # tablero; salto es None si la casilla de aterrizaje queda fuera.
+        self.posiciones = [divmod(i, columnas) for i in range(self.n)]
+
+        # Simetrías que conservan el juego (ver transformar_clave). Cambiar los colores
+        # exige llevar las casillas de un bando a las del otro sin salir de las oscuras:
+        # con filas + columnas par, giro de 180°; si no, con un número impar de filas,
+        # volteo vertical. El espejo izquierda-derecha solo conserva las casillas
+        # oscuras con un número impar de columnas (en 4x4 las lleva a las claras).
+        giro = [self.n - 1 - i for i in range(self.n)]
+        volteo = [self.casilla(filas - 1 - fil, col) for fil, col in self.posiciones]
+        espejo = [self.casilla(fil, columnas - 1 - col) for fil, col in self.posiciones]
+        cambio_color = giro if (filas + columnas) % 2 == 0 else volteo if filas % 2 == 1 else None
+        self.simetria_color = cambio_color is not None
+        self.simetria_espejo = columnas % 2 == 1
+        # Bit de la clave al que va cada bit para cada (cambiar_color, reflejar) válido
+        self._mapas_clave = {}
+        for cambiar_color in ((False, True) if self.simetria_color else (False,)):
+            for reflejar in ((False, True) if self.simetria_espejo else (False,)):
+                casillas = list(range(self.n))
+                if cambiar_color:
+                    casillas = [cambio_color[i] for i in casillas]
+                if reflejar:
+                    casillas = [espejo[i] for i in casillas]
+                self._mapas_clave[(cambiar_color, reflejar)] = [
+                    (tipo ^ 2 if cambiar_color else tipo) * self.n + casillas[i]
+                    for tipo in range(4) for i in range(self.n)]
+
+        self.vecinos_rey = [self._vecinos(i, DIRECCIONES_REY) for i in range(self.n)]
+        self.vecinos_rojo = [self._vecinos(i, DIRECCIONES_ROJO) for i in range(self.n)]
+        self.vecinos_blanco = [self._vecinos(i, DIRECCIONES_BLANCO) for i in range(self.n)]
+
+        # Desplazamientos de bits para contar movimientos de todas las piezas a la vez:
+        # (avance de fila, desplazamiento, casillas con paso dentro, casillas con salto dentro)
+        self.todas = (1 << self.n) - 1
+        self.desplazamientos = []
+        for df, dc in DIRECCIONES_REY:
+            con_paso = con_salto = 0
+            for i, (fil, col) in enumerate(self.posiciones):
+                if 0 <= fil + df < filas and 0 <= col + dc < columnas:
+                    con_paso |= 1 << i
+                if 0 <= fil + 2 * df < filas and 0 <= col + 2 * dc < columnas:
+                    con_salto |= 1 << i
+            self.desplazamientos.append((df, df * columnas + dc, con_paso, con_salto))
+
+        # Valor de cada pieza en cada casilla para evaluate_board, en UNIDADES_POR_PUNTO:
+        # material más avance (las blancas avanzan hacia abajo y las rojas hacia arriba)
+        self.puntos = []
+        for fil, col in self.posiciones:
+            avance_blancas = 2 * (filas - fil)
+            avance_rojas = 2 * fil
+            self.puntos.append((20 + avance_blancas, 60 + avance_blancas,
+                                -20 - avance_rojas, -60 - avance_rojas))
+
+        # Claves Zobrist: un número aleatorio de 64 bits por casilla y tipo de pieza
+        # (0 peón blanco, 1 rey blanco, 2 peón rojo, 3 rey rojo) y otro para el turno de ROJO.
+        # La semilla depende solo del tamaño, así que los hashes son reproducibles entre procesos.
+        azar = random.Random(f"zobrist {filas}x{columnas}")
+        self.zobrist = [[azar.getrandbits(64) for _ in range(4)] for _ in range(self.n)]
+        self.zobrist_turno = azar.getrandbits(64)
+
+    def _vecinos(self, i, direcciones):
+        fil, col = divmod(i, self.columnas)
+        vecinos = []
+        for df, dc in direcciones:
+            f, c = fil + df, col + dc
+            if 0 <= f < self.filas and 0 <= c < self.columnas:
+                f2, c2 = f + df, c + dc
+                salto = self.casilla(f2, c2) if 0 <= f2 < self.filas and 0 <= c2 < self.columnas else None
+                vecinos.append((self.casilla(f, c), salto))
+        return vecinos
+
+    def vecinos(self, color, king):
+        """Tabla de vecinos según el tipo de pieza: los reyes mueven en las cuatro diagonales"""
+        if king:
+            return self.vecinos_rey
+        return self.vecinos_rojo if color == ROJO else self.vecinos_blanco
+
+    def casilla(self, fil, col):
+        """Convierte una posición (fila, columna) en el índice de bit de la casilla"""
+        return fil * self.columnas + col
+
+    def posicion(self, casilla):
+        """Convierte un índice de casilla en la posición (fila, columna)"""
+        return divmod(casilla, self.columnas)
+
+    def transformar_clave(self, clave, cambiar_color=False, reflejar=False):
+        """
+        Clave de Motor.clave() de la posición simétrica: con cambiar_color, la del otro
+        bando (ver simetria_color); con reflejar, la del espejo izquierda-derecha (ver
+        simetria_espejo). Solo recorre las piezas.
+        """
+        mapa = self._mapas_clave[(cambiar_color, reflejar)]
+        transformada = 0
+        while clave:
+            bit = clave & -clave
+            clave ^= bit
+            transformada |= 1 << mapa[bit.bit_length() - 1]
+        return transformada
+
+    def __reduce__(self):
+        # Al copiar o enviar a otro proceso se reutiliza la instancia compartida
+        return obtener_geometria, (self.filas, self.columnas, self.filas_iniciales)
+
+    def __repr__(self):
+        return f"Geometria({self.filas}, {self.columnas}, filas_iniciales={self.filas_iniciales})"
+
+
+_geometrias = {}
+
+
+def obtener_geometria(filas=FILAS, columnas=COLUMNAS, filas_iniciales=None):
+    """Geometría compartida para un tamaño de tablero (se construye la primera vez)"""
+    clave = (filas, columnas, filas_iniciales)
+    if clave not in _geometrias:
+        geometria = Geometria(filas, columnas, filas_iniciales)
+        _geometrias[clave] = geometria
+        _geometrias[(filas, columnas, geometria.filas_iniciales)] = geometria
+    return _geometrias[clave]
+
+
+# Tablero por defecto del juego (constantes.FILAS x constantes.COLUMNAS)
+GEOMETRIA = obtener_geometria()
+
+
+class Motor:
+    """
+    Estado del tablero representado con cuatro enteros (bitboards):
+    peones blancos, reyes blancos, peones rojos y reyes rojos.
+    El tamaño del tablero lo da su Geometria (por defecto, FILAS x COLUMNAS).
+    """
+    __slots__ = ('blancas', 'blancas_reyes', 'rojas', 'rojas_reyes', 'hash', 'puntos', 'geometria')
+
+    def __init__(self, vacio=False, geometria=None):
+        self.geometria = geometria if geometria is not None else GEOMETRIA
+        self.blancas = 0
+        self.blancas_reyes = 0
+        self.rojas = 0
+        self.rojas_reyes = 0
+        self.hash = 0  # Zobrist de las piezas, actualizado en cada movimiento
+        self.puntos = 0  # Material y avance para evaluar(), actualizado en cada movimiento
+        if not vacio:
+            self.posicion_inicial()
+
+    def posicion_inicial(self):
+        """Peones en las casillas oscuras de las filas iniciales de cada bando"""
+        self.blancas = self.geometria.inicial_blancas
+        self.rojas = self.geometria.inicial_rojas
+        self.blancas_reyes = self.rojas_reyes = 0
+        self.recalcular_hash()
+        self.recalcular_puntos()
+
+    def recalcular_hash(self):
+        """Calcula el hash Zobrist desde cero (tras asignar los bitboards a mano)"""
+        zobrist = self.geometria.zobrist
+        h = 0
+        for tipo, bitboard in enumerate((self.blancas, self.blancas_reyes, self.rojas, self.rojas_reyes)):
+            while bitboard:
+                bit = bitboard & -bitboard
+                bitboard ^= bit
+                h ^= zobrist[bit.bit_length() - 1][tipo]
+        self.hash = h
+        return h
+
+    def recalcular_puntos(self):
+        """Calcula material y avance desde cero (tras asignar los bitboards a mano)"""
+        puntos = self.geometria.puntos
+        total = 0
+        for tipo, bitboard in enumerate((self.blancas, self.blancas_reyes, self.rojas, self.rojas_reyes)):
+            while bitboard:
+                bit = bitboard & -bitboard
+                bitboard ^= bit
+                total += puntos[bit.bit_length() - 1][tipo]
+        self.puntos = total
+        return total
+
+    def clave(self):
+        """
+        Clave entera única de la posición: los cuatro bitboards empaquetados
+        (peones blancos, reyes blancos, peones rojos, reyes rojos)
+        """
+        n = self.geometria.n
+        return (self.blancas | self.blancas_reyes << n |
+                self.rojas << 2 * n | self.rojas_reyes << 3 * n)
+
+    def clave_tras(self, movimiento):
+        """Clave de la posición resultante de un movimiento, sin modificar el estado"""
+        return self.claves_sucesores((movimiento,))[0]
+
+    def tipo_pieza(self, i):
+        """Índice de la pieza de la casilla i en la clave: 0 peón blanco, 1 rey blanco, 2 peón rojo, 3 rey rojo"""
+        bit = 1 << i
+        if self.blancas & bit:
+            return 0
+        if self.blancas_reyes & bit:
+            return 1
+        return 2 if self.rojas & bit else 3
+
+    def claves_sucesores(self, movimientos):
+        """
+        Clave de la posición tras cada movimiento, calculada sobre la clave actual
+        con tres XOR (origen, destino y capturada) sin aplicar los movimientos
+        """
+        n = self.geometria.n
+        coronacion = self.geometria.coronacion
+        clave = self.clave()
+        blancas, blancas_reyes, rojas = self.blancas, self.blancas_reyes, self.rojas
+        tipo_pieza = self.tipo_pieza
+        claves = []
+        for origen, destino, capturada in movimientos:
+            tipo = 0 if blancas >> origen & 1 else 1 if blancas_reyes >> origen & 1 else 2 if rojas >> origen & 1 else 3
+            # Un peón que llega a la fila de coronación pasa a ser rey (tipo impar)
+            siguiente = clave ^ 1 << (origen + tipo * n) ^ 1 << (destino + (tipo | coronacion >> destino & 1) * n)
+            if capturada is not None:
+                siguiente ^= 1 << (capturada + tipo_pieza(capturada) * n)
+            claves.append(siguiente)
+        return claves
+
+    def clave_zobrist(self, color):
+        """Hash de la posición incluyendo el turno (color que mueve)"""
+        return self.hash ^ self.geometria.zobrist_turno if color == ROJO else self.hash
+
+    @classmethod
+    def desde_clave(cls, clave, geometria=None):
+        """Motor con la posición de una clave de clave() (p. ej. un estado de la tabla Q)"""
+        motor = cls(vacio=True, geometria=geometria)
+        n = motor.geometria.n
+        mascara = (1 << n) - 1
+        motor.blancas, motor.blancas_reyes = clave & mascara, clave >> n & mascara
+        motor.rojas, motor.rojas_reyes = clave >> 2 * n & mascara, clave >> 3 * n
+        motor.recalcular_hash()
+        motor.recalcular_puntos()
+        return motor
+
+    @classmethod
+    def desde_texto(cls, texto, filas_iniciales=None):
+        """
+        Crea un motor a partir de filas separadas por '/' o saltos de línea, con una
+        letra por casilla: '.' vacía, 'B'/'K' peón/rey blanco, 'R'/'Q' peón/rey rojo
+        (el mismo formato que print_board_state y __repr__).
+        El tamaño del tablero se deduce del texto.
+        """
+        filas = [fila.strip() for fila in texto.replace('/', '\n').split('\n') if fila.strip()]
+        filas = [fila.split() if ' ' in fila else list(fila) for fila in filas]
+        columnas = len(filas[0]) if filas else 0
+        for fil, letras in enumerate(filas):
+            if len(letras) != columnas:
+                raise ValueError(f"La fila {fil} debe tener {columnas} casillas")
+        geometria = obtener_geometria(len(filas), columnas, filas_iniciales)
+        motor = cls(vacio=True, geometria=geometria)
+        for fil, letras in enumerate(filas):
+            for col, letra in enumerate(letras):
+                bit = 1 << geometria.casilla(fil, col)
+                if letra == 'B':
+                    motor.blancas |= bit
+                elif letra == 'K':
+                    motor.blancas_reyes |= bit
+                elif letra == 'R':
+                    motor.rojas |= bit
+                elif letra == 'Q':
+                    motor.rojas_reyes |= bit
+                elif letra != '.':
+                    raise ValueError(f"Casilla desconocida '{letra}'")
+        motor.recalcular_hash()
+        motor.recalcular_puntos()
+        return motor
+
+    def copiar(self):
+        nuevo = Motor(vacio=True, geometria=self.geometria)
+        nuevo.blancas = self.blancas
+        nuevo.blancas_reyes = self.blancas_reyes
+        nuevo.rojas = self.rojas
+        nuevo.rojas_reyes = self.rojas_reyes
+        nuevo.hash = self.hash
+        nuevo.puntos = self.puntos
+        return nuevo
+
+    def ocupadas(self):
+        return self.blancas | self.blancas_reyes | self.rojas | self.rojas_reyes
+
+    def piezas(self, color):
+        """Bitboard con todas las piezas (peones y reyes) de un color"""
+        if color == BLANCO:
+            return self.blancas | self.blancas_reyes
+        return self.rojas | self.rojas_reyes
+
+    def num_piezas(self, color):
+        return contar_bits(self.piezas(color))
+
+    def total_piezas(self):
+        return contar_bits(self.blancas | self.blancas_reyes | self.rojas | self.rojas_reyes)
+
+    def num_reyes(self, color):
+        return contar_bits(self.blancas_reyes if color == BLANCO else self.rojas_reyes)
+
+    def get_casilla(self, i):
+        """Devuelve (color, es_rey) de la pieza en la casilla i, o None si está vacía"""
+        bit = 1 << i
+        if self.blancas & bit:
+            return BLANCO, False
+        if self.blancas_reyes & bit:
+            return BLANCO, True
+        if self.rojas & bit:
+            return ROJO, False
+        if self.rojas_reyes & bit:
+            return ROJO, True
+        return None
+
+    def ganador(self):
+        if not (self.rojas | self.rojas_reyes):
+            return BLANCO
+        elif not (self.blancas | self.blancas_reyes):
+            return ROJO
+        return None
+
+    def movimientos_pieza(self, i, color, king):
+        """
+        Genera los movimientos de la pieza en la casilla i como tuplas
+        (origen, destino, capturada), con capturada=None si no hay captura
+        """
+        movimientos = []
+        ocupadas = self.blancas | self.blancas_reyes | self.rojas | self.rojas_reyes
+        rivales = self.rojas | self.rojas_reyes if color == BLANCO else self.blancas | self.blancas_reyes
+        for paso, salto in self.geometria.vecinos(color, king)[i]:
+            if not ocupadas >> paso & 1:  # Posición vacía
+                movimientos.append((i, paso, None))
+            elif salto is not None and rivales >> paso & 1 and not ocupadas >> salto & 1:
+                movimientos.append((i, salto, paso))
+        return movimientos
+
+    def get_movimientos_validos(self, fil, col, color, king):
+        """Mismo formato que Tablero.get_movimientos_validos: {(fil, col): [capturadas]}"""
+        posiciones = self.geometria.posiciones
+        movimientos = {}
+        for _, destino, capturada in self.movimientos_pieza(self.geometria.casilla(fil, col), color, king):
+            movimientos[posiciones[destino]] = [posiciones[capturada]] if capturada is not None else []
+        return movimientos
+
+    def generar_movimientos(self, color):
+        """
+        Todos los movimientos de un color, recorriendo las piezas por filas
+        y columnas como Juego.get_all_possible_moves
+        """
+        movimientos = []
+        g = self.geometria
+        if color == BLANCO:
+            peones, reyes = self.blancas, self.blancas_reyes
+            rivales = self.rojas | self.rojas_reyes
+            vecinos_peon = g.vecinos_blanco
+        else:
+            peones, reyes = self.rojas, self.rojas_reyes
+            rivales = self.blancas | self.blancas_reyes
+            vecinos_peon = g.vecinos_rojo
+        vecinos_rey = g.vecinos_rey
+        propias = peones | reyes
+        ocupadas = propias | rivales
+        while propias:
+            bit = propias & -propias
+            propias ^= bit
+            i = bit.bit_length() - 1
+            for paso, salto in (vecinos_rey if reyes & bit else vecinos_peon)[i]:
+                if not ocupadas >> paso & 1:
+                    movimientos.append((i, paso, None))
+                elif salto is not None and rivales >> paso & 1 and not ocupadas >> salto & 1:
+                    movimientos.append((i, salto, paso))
+        return movimientos
+
+    def bloqueado(self, color):
+        g = self.geometria
+        if color == BLANCO:
+            reyes, rivales, vecinos_peon = self.blancas_reyes, self.rojas | self.rojas_reyes, g.vecinos_blanco
+        else:
+            reyes, rivales, vecinos_peon = self.rojas_reyes, self.blancas | self.blancas_reyes, g.vecinos_rojo
+        propias = self.piezas(color)
+        ocupadas = propias | rivales
+        while propias:
+            bit = propias & -propias
+            propias ^= bit
+            for paso, salto in (g.vecinos_rey if reyes & bit else vecinos_peon)[bit.bit_length() - 1]:
+                if not ocupadas >> paso & 1:
+                    return False
+                if salto is not None and rivales >> paso & 1 and not ocupadas >> salto & 1:
+                    return False
+        return True
+
+    def movilidad(self, color):
+        """
+        Número de movimientos de un color (len(generar_movimientos(color))) contado
+        con desplazamientos de bits, una dirección cada vez, sin generar la lista
+        """
+        g = self.geometria
+        if color == BLANCO:
+            peones, reyes, rivales = self.blancas, self.blancas_reyes, self.rojas | self.rojas_reyes
+            sentido = 1
+        else:
+            peones, reyes, rivales = self.rojas, self.rojas_reyes, self.blancas | self.blancas_reyes
+            sentido = -1
+        vacias = g.todas & ~(peones | reyes | rivales)
+        total = 0
+        for df, desplazamiento, con_paso, con_salto in g.desplazamientos:
+            piezas = peones | reyes if df == sentido else reyes
+            if not piezas:
+                continue
+            if desplazamiento > 0:
+                total += contar_bits((piezas & con_paso) << desplazamiento & vacias)
+                total += contar_bits(((piezas & con_salto) << desplazamiento & rivales) << desplazamiento & vacias)
+            else:
+                desplazamiento = -desplazamiento
+                total += contar_bits((piezas & con_paso) >> desplazamiento & vacias)
+                total += contar_bits(((piezas & con_salto) >> desplazamiento & rivales) >> desplazamiento & vacias)
+        return total
+
+    def evaluar(self):
+        """
+        Puntuación de evaluate_board desde el punto de vista de BLANCO: material y
+        avance mantenidos en cada movimiento más 0.05 por cada movimiento disponible
+        """
+        return (self.puntos + self.movilidad(BLANCO) - self.movilidad(ROJO)) / UNIDADES_POR_PUNTO
+
+    def mover(self, origen, destino):
+        """Mueve la pieza de origen a destino y la corona si llega a un extremo"""
+        b_origen, b_destino = 1 << origen, 1 << destino
+        corona = self.geometria.coronacion & b_destino
+        zobrist = self.geometria.zobrist
+        z_origen, z_destino = zobrist[origen], zobrist[destino]
+        puntos = self.geometria.puntos
+        p_origen, p_destino = puntos[origen], puntos[destino]
+        if self.blancas & b_origen:
+            self.blancas ^= b_origen
+            if corona:
+                self.blancas_reyes |= b_destino
+                self.hash ^= z_origen[0] ^ z_destino[1]
+                self.puntos += p_destino[1] - p_origen[0]
+            else:
+                self.blancas |= b_destino
+                self.hash ^= z_origen[0] ^ z_destino[0]
+                self.puntos += p_destino[0] - p_origen[0]
+        elif self.blancas_reyes & b_origen:
+            self.blancas_reyes ^= b_origen | b_destino
+            self.hash ^= z_origen[1] ^ z_destino[1]
+            self.puntos += p_destino[1] - p_origen[1]
+        elif self.rojas & b_origen:
+            self.rojas ^= b_origen
+            if corona:
+                self.rojas_reyes |= b_destino
+                self.hash ^= z_origen[2] ^ z_destino[3]
+                self.puntos += p_destino[3] - p_origen[2]
+            else:
+                self.rojas |= b_destino
+                self.hash ^= z_origen[2] ^ z_destino[2]
+                self.puntos += p_destino[2] - p_origen[2]
+        elif self.rojas_reyes & b_origen:
+            self.rojas_reyes ^= b_origen | b_destino
+            self.hash ^= z_origen[3] ^ z_destino[3]
+            self.puntos += p_destino[3] - p_origen[3]
+
+    def eliminar(self, i):
+        bit = 1 << i
+        z = self.geometria.zobrist[i]
+        p = self.geometria.puntos[i]
+        if self.blancas & bit:
+            self.blancas ^= bit
+            self.hash ^= z[0]
+            self.puntos -= p[0]
+        elif self.blancas_reyes & bit:
+            self.blancas_reyes ^= bit
+            self.hash ^= z[1]
+            self.puntos -= p[1]
+        elif self.rojas & bit:
+            self.rojas ^= bit
+            self.hash ^= z[2]
+            self.puntos -= p[2]
+        elif self.rojas_reyes & bit:
+            self.rojas_reyes ^= bit
+            self.hash ^= z[3]
+            self.puntos -= p[3]
+
+    def hacer_movimiento(self, movimiento):
+        """Aplica un movimiento en el sitio y devuelve lo necesario para deshacerlo"""
+        deshacer = (self.blancas, self.blancas_reyes, self.rojas, self.rojas_reyes, self.hash, self.puntos)
+        origen, destino, capturada = movimiento
+        if capturada is not None:
+            self.eliminar(capturada)
+        self.mover(origen, destino)
+        return deshacer
+
+    def deshacer_movimiento(self, deshacer):
+        self.blancas, self.blancas_reyes, self.rojas, self.rojas_reyes, self.hash, self.puntos = deshacer
+
+    def __eq__(self, otro):
+        return (isinstance(otro, Motor) and self.geometria.filas == otro.geometria.filas and
+                self.geometria.columnas == otro.geometria.columnas and
+                self.blancas == otro.blancas and self.blancas_reyes == otro.blancas_reyes and
+                self.rojas == otro.rojas and self.rojas_reyes == otro.rojas_reyes)
+
+    def __hash__(self):
+        return hash((self.blancas, self.blancas_reyes, self.rojas, self.rojas_reyes))
+
+    def __repr__(self):
+        g = self.geometria
+        filas = []
+        for fil in range(g.filas):
+            fila = []
+            for col in range(g.columnas):
+                pieza = self.get_casilla(g.casilla(fil, col))
+                if pieza is None:
+                    fila.append('.')
+                elif pieza[0] == BLANCO:
+                    fila.append('K' if pieza[1] else 'B')
+                else:
+                    fila.append('Q' if pieza[1] else 'R')
+            filas.append(' '.join(fila))
+        return '\n'.join(filas)
@@ -0,0 +1,295 @@
+"""
+Perft: cuenta las posiciones hoja hasta una profundidad para verificar y perfilar
+la generación de movimientos.
+
+    python perft.py --profundidad 8                 # nodos por profundidad y nodos/s
+    python perft.py --profundidad 6 --divide        # desglose por movimiento raíz
+    python perft.py --profundidad 6 --verificar     # compara con el generador y la evaluación de referencia
+    python perft.py --posicion ".B.B/..../..../R.R." --turno blanco
+    python perft.py --filas 8 --columnas 8 --profundidad 6
+"""
+import sys
+import copy
+import time
+import argparse
+from constantes import *
+from pieza import Pieza
+from tablero import Tablero
+from minimax import evaluate_board
+from qlearning import calcular_recompensa
+import evaluacion_lote
+from motor import Motor, obtener_geometria
+
+
+def otro(color):
+    return ROJO if color == BLANCO else BLANCO
+
+
+def perft(motor, color, profundidad):
+    """Número de posiciones hoja a la profundidad dada"""
+    if profundidad == 0:
+        return 1
+    movimientos = motor.generar_movimientos(color)
+    if profundidad == 1:
+        return len(movimientos)
+    rival = otro(color)
+    nodos = 0
+    for movimiento in movimientos:
+        deshacer = motor.hacer_movimiento(movimiento)
+        nodos += perft(motor, rival, profundidad - 1)
+        motor.deshacer_movimiento(deshacer)
+    return nodos
+
+
+def divide(motor, color, profundidad):
+    """Nodos hoja bajo cada movimiento de la raíz"""
+    resultado = []
+    for movimiento in motor.generar_movimientos(color):
+        deshacer = motor.hacer_movimiento(movimiento)
+        resultado.append((movimiento, perft(motor, otro(color), profundidad - 1)))
+        motor.deshacer_movimiento(deshacer)
+    return resultado
+
+
+class TableroReferencia:
+    """
+    Generador original basado en una cuadrícula de objetos Pieza, tal como
+    estaba Tablero antes del motor de bitboards. Solo se usa para verificar
+    que cualquier generador más rápido no cambia las reglas.
+    """
+    def __init__(self, motor):
+        self.geometria = motor.geometria
+        self.filas, self.columnas = motor.geometria.filas, motor.geometria.columnas
+        self.tablero = []
+        for fil in range(self.filas):
+            self.tablero.append([])
+            for col in range(self.columnas):
+                contenido = motor.get_casilla(self.geometria.casilla(fil, col))
+                if contenido is None:
+                    self.tablero[fil].append(0)
+                else:
+                    pieza = Pieza(fil, col, contenido[0])
+                    if contenido[1]:
+                        pieza.make_king()
+                    self.tablero[fil].append(pieza)
+
+    def get_movimientos_validos(self, pieza):
+        movimientos = {}
+        direcciones = []
+
+        if pieza.king:
+            direcciones = [
+                (-1, -1), (-1, 1),  # Movimientos diagonales hacia arriba
+                (1, -1), (1, 1)     # Movimientos diagonales hacia abajo
+            ]
+        else:
+            if pieza.color == ROJO:
+                direcciones = [(-1, -1), (-1, 1)]  # Movimientos diagonales hacia arriba
+            else:  # BLANCO
+                direcciones = [(1, -1), (1, 1)]    # Movimientos diagonales hacia abajo
+
+        for dir in direcciones:
+            fil, col = pieza.fil + dir[0], pieza.col + dir[1]
+            if 0 <= fil < self.filas and 0 <= col < self.columnas:
+                siguiente_fila, siguiente_columna = fil + dir[0], col + dir[1]
+                if self.tablero[fil][col] == 0:  # Posición vacía
+                    movimientos[(fil, col)] = []
+                elif self.tablero[fil][col].color != pieza.color:
+                    # Verificar que la pieza a capturar es del color opuesto
+                    if 0 <= siguiente_fila < self.filas and 0 <= siguiente_columna < self.columnas:
+                        if self.tablero[siguiente_fila][siguiente_columna] == 0:
+                            movimientos[(siguiente_fila, siguiente_columna)] = [(fil, col)]
+
+        return movimientos
+
+    def evaluar(self):
+        """evaluate_board original: recorre las casillas y genera los movimientos de cada pieza"""
+        score = 0
+        for fila in self.tablero:
+            for pieza in fila:
+                if pieza == 0:
+                    continue
+                if pieza.color == BLANCO:
+                    score += 1
+                    if pieza.king:
+                        score += 2
+                    score += (self.filas - pieza.fil) * 0.1
+                else:
+                    score -= 1
+                    if pieza.king:
+                        score -= 2
+                    score -= pieza.fil * 0.1
+                movimientos = self.get_movimientos_validos(pieza)
+                score += len(movimientos) * 0.05 if pieza.color == BLANCO else -len(movimientos) * 0.05
+        return score
+
+    def move(self, pieza, fil, col):
+        self.tablero[pieza.fil][pieza.col], self.tablero[fil][col] = self.tablero[fil][col], self.tablero[pieza.fil][pieza.col]
+        pieza.move(fil, col)
+        if (fil == self.filas - 1 or fil == 0) and not pieza.king:
+            pieza.make_king()
+
+    def eliminar(self, piezas):
+        for fil, col in piezas:
+            self.tablero[fil][col] = 0
+
+    def generar_movimientos(self, color):
+        """Movimientos como tuplas (origen, destino, capturada) en el orden de Juego.get_all_possible_moves"""
+        casilla = self.geometria.casilla
+        movimientos = []
+        for fil in range(self.filas):
+            for col in range(self.columnas):
+                pieza = self.tablero[fil][col]
+                if pieza != 0 and pieza.color == color:
+                    for destino, capturadas in self.get_movimientos_validos(pieza).items():
+                        capturada = casilla(*capturadas[0]) if capturadas else None
+                        movimientos.append((casilla(fil, col), casilla(*destino), capturada))
+        return movimientos
+
+    def aplicar(self, movimiento):
+        """Copia del tablero con el movimiento aplicado, como hacía simulate_move"""
+        nuevo = copy.deepcopy(self)
+        posicion = self.geometria.posicion
+        origen, destino, capturada = movimiento
+        if capturada is not None:
+            nuevo.eliminar([posicion(capturada)])
+        fil, col = posicion(origen)
+        nuevo.move(nuevo.tablero[fil][col], *posicion(destino))
+        return nuevo
+
+    def coincide(self, motor):
+        return Motor.desde_texto(self.texto(), self.geometria.filas_iniciales) == motor
+
+    def texto(self):
+        filas = []
+        for fila in self.tablero:
+            letras = []
+            for pieza in fila:
+                if pieza == 0:
+                    letras.append('.')
+                elif pieza.color == BLANCO:
+                    letras.append('K' if pieza.king else 'B')
+                else:
+                    letras.append('Q' if pieza.king else 'R')
+            filas.append(''.join(letras))
+        return '/'.join(filas)
+
+
+# Diferencia admitida entre la evaluación incremental (en enteros) y la suma en coma flotante original
+TOLERANCIA_EVALUACION = 1e-9
+
+
+def verificar(motor, color, profundidad, errores, limite_errores=10):
+    """
+    Recorre el árbol comparando en cada nodo la lista de movimientos del motor
+    con la del generador de referencia, la evaluación con la original,
+    la posición resultante de cada movimiento y la evaluación y recompensa
+    por lotes de los sucesores con las de una en una, y sus claves con las del motor.
+    Returns:
+        nodos hoja (igual que perft)
+    """
+    if len(errores) >= limite_errores:
+        return 0
+    movimientos = motor.generar_movimientos(color)
+    referencia = TableroReferencia(motor)
+    esperados = referencia.generar_movimientos(color)
+    if movimientos != esperados:
+        errores.append(f"Movimientos distintos en\n{motor!r}\n(turno {color_to_name(color)}): "
+                       f"motor {movimientos} / referencia {esperados}")
+        return 0
+    if motor.movilidad(color) != len(esperados):
+        errores.append(f"Movilidad {motor.movilidad(color)} distinta de {len(esperados)} en\n{motor!r}")
+        return 0
+    if abs(evaluate_board(Tablero(motor)) - referencia.evaluar()) > TOLERANCIA_EVALUACION:
+        errores.append(f"evaluate_board {evaluate_board(Tablero(motor))} distinto de {referencia.evaluar()} en\n{motor!r}")
+        return 0
+    # La vista Tablero (la API que usa Juego) debe dar los mismos diccionarios por pieza
+    vista = Tablero(motor.copiar())
+    for fila in referencia.tablero:
+        for pieza in fila:
+            if pieza != 0 and vista.get_movimientos_validos(pieza) != referencia.get_movimientos_validos(pieza):
+                errores.append(f"Tablero.get_movimientos_validos distinto para {(pieza.fil, pieza.col)} en\n{motor!r}")
+                return 0
+    if profundidad == 0:
+        return 1
+    nodos = 0
+    sin_captura = profundidad * 3  # Distintos valores para cubrir todas las ramas de la recompensa
+    evaluaciones = evaluacion_lote.evaluar_sucesores(vista, movimientos)
+    recompensas = evaluacion_lote.recompensas_sucesores(vista, movimientos, sin_captura)
+    claves = motor.claves_sucesores(movimientos)
+    for movimiento, evaluacion, recompensa, clave_sucesor in zip(movimientos, evaluaciones, recompensas, claves):
+        siguiente = referencia.aplicar(movimiento)
+        deshacer = motor.hacer_movimiento(movimiento)
+        captura = movimiento[2] is not None
+        if evaluacion != evaluate_board(Tablero(motor)):
+            errores.append(f"Evaluación por lotes {evaluacion} distinta tras {movimiento}:\n{motor!r}")
+        elif recompensa != calcular_recompensa(Tablero(motor), captura, 0 if captura else sin_captura + 1):
+            errores.append(f"Recompensa por lotes {recompensa} distinta tras {movimiento}:\n{motor!r}")
+        elif not siguiente.coincide(motor):
+            errores.append(f"Posición distinta tras {movimiento}:\nmotor\n{motor!r}\nreferencia {siguiente.texto()}")
+        elif motor.hash != motor.copiar().recalcular_hash():
+            errores.append(f"Hash Zobrist incremental incorrecto tras {movimiento}:\n{motor!r}")
+        elif motor.puntos != motor.copiar().recalcular_puntos():
+            errores.append(f"Material incremental incorrecto tras {movimiento}:\n{motor!r}")
+        elif motor.clave() != clave_sucesor:
+            errores.append(f"Clave del sucesor {clave_sucesor} distinta de {motor.clave()} tras {movimiento}:\n{motor!r}")
+        else:
+            nodos += verificar(motor, otro(color), profundidad - 1, errores, limite_errores)
+        motor.deshacer_movimiento(deshacer)
+    return nodos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft del motor de damas")
+    parser.add_argument("--profundidad", type=int, default=6)
+    parser.add_argument("--posicion", help="filas separadas por '/': . B K R Q (por defecto, la inicial)")
+    parser.add_argument("--turno", choices=["rojo", "blanco"], default="rojo")
+    parser.add_argument("--divide", action="store_true", help="nodos bajo cada movimiento raíz")
+    parser.add_argument("--verificar", action="store_true", help="comparar con el generador de referencia")
+    parser.add_argument("--filas", type=int, default=FILAS)
+    parser.add_argument("--columnas", type=int, default=COLUMNAS)
+    parser.add_argument("--filas-iniciales", type=int, default=None,
+                        help="filas con peones de cada bando al empezar (por defecto, según el tamaño)")
+    args = parser.parse_args()
+
+    if args.posicion:
+        motor = Motor.desde_texto(args.posicion, args.filas_iniciales)
+    else:
+        motor = Motor(geometria=obtener_geometria(args.filas, args.columnas, args.filas_iniciales))
+    posicion = motor.geometria.posicion
+    color = ROJO if args.turno == "rojo" else BLANCO
+    print(repr(motor))
+    print(f"Turno: {color_to_name(color)}\n")
+
+    for profundidad in range(1, args.profundidad + 1):
+        inicio = time.perf_counter()
+        nodos = perft(motor, color, profundidad)
+        duracion = time.perf_counter() - inicio
+        nps = nodos / duracion if duracion > 0 else 0.0
+        print(f"perft({profundidad:2d}) = {nodos:12d}   {duracion:8.3f}s   {nps:12.0f} nodos/s")
+
+    if args.divide:
+        print()
+        total = 0
+        for (origen, destino, capturada), nodos in divide(motor, color, args.profundidad):
+            captura = f" x{posicion(capturada)}" if capturada is not None else ""
+            print(f"{posicion(origen)} -> {posicion(destino)}{captura}: {nodos}")
+            total += nodos
+        print(f"Total: {total}")
+
+    if args.verificar:
+        errores = []
+        inicio = time.perf_counter()
+        nodos = verificar(motor, color, args.profundidad, errores)
+        duracion = time.perf_counter() - inicio
+        if errores:
+            print(f"\nVERIFICACIÓN FALLIDA ({len(errores)} errores):")
+            for error in errores:
+                print(error)
+            return 1
+        print(f"\nVerificación correcta: {nodos} nodos iguales al generador de referencia ({duracion:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
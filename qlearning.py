@@ -1,44 +1,115 @@
 import numpy as np
 import pickle
 import os
+import sys
+import time
+import atexit
+import signal
+import tempfile
+import threading
 from constantes import *
+from tabla_q import TablaQ, TablaQCompacta, TablaQMapeada, escribir_mezcla, LRU
+from estadisticas import EstadisticasPartidas
+from motor import Motor
+
+# Recompensa por ganar la partida en calcular_recompensa; es también el valor
+# exacto de una victoria conocida por el solucionario
+VALOR_VICTORIA = 200
 
 class QLearningAgent:
-    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.2):  
+    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.2,
+                 archivo_q_table='q_table.pkl', archivo_estadisticas='estadisticas.pkl',
+                 memoria_q_mb=None, politica_desalojo=LRU, histograma_cada=None, simetrias=False):
+        """
+        La tabla Q no se carga aquí: llamar a load_q_table una vez por sesión.
+        Cada tamaño de tablero necesita sus propios archivos, ya que las claves dependen de él.
+        Con memoria_q_mb la tabla Q es una TablaQCompacta con ese límite de memoria
+        que desaloja entradas según politica_desalojo; sin él, un diccionario sin límite.
+        Si archivo_q_table termina en .qmap, la tabla se proyecta en memoria desde
+        ese archivo (TablaQMapeada) en lugar de leerse entera, y memoria_q_mb no se usa;
+        save_q_table solo la reescribe tras permitir_escritura.
+        Con histograma_cada se guarda un histograma de las recompensas recientes
+        cada tantas partidas (ver EstadisticasPartidas).
+        Con simetrias, las posiciones simétricas comparten sus valores Q (ver
+        get_state_key): las de BLANCO al mover usan los aprendidos por ROJO en la
+        posición con los colores cambiados. Sus claves no se mezclan con las normales:
+        la tabla y sus estadísticas usan archivos propios (q_table_simetrias.pkl,
+        ver archivo_simetrias).
+        """
+        if simetrias:
+            archivo_q_table = archivo_simetrias(archivo_q_table)
+            archivo_estadisticas = archivo_estadisticas and archivo_simetrias(archivo_estadisticas)
+        self.archivo_q_table = archivo_q_table
+        self.archivo_estadisticas = archivo_estadisticas
         self.alpha = alpha  
         self.gamma = gamma  
         self.epsilon = epsilon  
+        self.epsilon_inicial = epsilon  
         self.min_epsilon = 0.01  
         self.epsilon_decay = 0.9999  
-        self.q_table = {}  
+        if archivo_q_table.endswith('.qmap'):
+            self.q_table = TablaQMapeada()
+        elif memoria_q_mb:
+            self.q_table = TablaQCompacta(memoria_q_mb, politica_desalojo)
+        else:
+            self.q_table = TablaQ()
         self.victorias = 0
         self.derrotas = 0
         self.empates = 0
-        self.historial_recompensas = []
-        self.historial_movimientos = []
+        self.partidas = EstadisticasPartidas(histograma_cada=histograma_cada)
         self.tiempo_promedio_partida = 0
         self.total_partidas = 0
         self.partidas_desde_ultimo_ajuste = 0
-        self.load_q_table()
-
-    def get_state_key(self, tablero):
-        """Convierte el estado del tablero en una cadena única"""
-        state = []
-        for fil in range(FILAS):
-            for col in range(COLUMNAS):
-                pieza = tablero.tablero[fil][col]
-                if pieza == 0:
-                    state.append('0')
-                else:
-                    # Representa el color y si es rey
-                    value = '1' if pieza.color == BLANCO else '2'
-                    value += 'K' if pieza.king else 'N'
-                    state.append(value)
-        return ','.join(state)
+        # Solucionario opcional con el valor exacto de los finales (ver learn_claves)
+        self.finales = None
+        self.simetrias = simetrias
+
+    def nueva_partida(self):
+        """Prepara el agente para otra partida: la exploración vuelve a su valor inicial"""
+        self.epsilon = self.epsilon_inicial
+
+    def get_state_key(self, tablero, color=ROJO):
+        """
+        Convierte el estado del tablero en una clave entera (bitboards empaquetados).
+        Con simetrias es la clave de la forma canónica de la posición con color al
+        mover: si mueve BLANCO se cambian los colores, de modo que la clave es la
+        de una posición con ROJO al mover (el bando que mueve queda en la clave) y,
+        si el tablero lo permite, se toma la menor de la clave y la de su espejo
+        (ver simetria y Geometria.transformar_clave).
+        """
+        clave = tablero.motor.clave()
+        if self.simetrias:
+            clave = tablero.geometria.transformar_clave(clave, *self.simetria(tablero, color))
+        return clave
+
+    def simetria(self, tablero, color):
+        """(cambiar_color, reflejar) que lleva la posición con color al mover a su forma canónica"""
+        g = tablero.geometria
+        cambiar_color = color == BLANCO and g.simetria_color
+        reflejar = False
+        if g.simetria_espejo:
+            clave = g.transformar_clave(tablero.motor.clave(), cambiar_color)
+            reflejar = g.transformar_clave(clave, reflejar=True) < clave
+        return cambiar_color, reflejar
+
+    def claves_acciones(self, tablero, movimientos):
+        """
+        Claves de las acciones: las de las posiciones resultantes, con la misma
+        simetría que la clave de su estado. Las claves no se deshacen: la acción
+        elegida es el movimiento real de la misma posición en la lista.
+        """
+        claves = tablero.motor.claves_sucesores(movimientos)
+        if self.simetrias and movimientos:
+            cambiar_color, reflejar = self.simetria(tablero, color_al_mover(tablero, movimientos))
+            if cambiar_color or reflejar:
+                transformar = tablero.geometria.transformar_clave
+                claves = [transformar(clave, cambiar_color, reflejar) for clave in claves]
+        return claves
 
     def get_action(self, tablero, movimientos_posibles):
         """Selecciona una acción usando la política epsilon-greedy mejorada"""
-        state = self.get_state_key(tablero)
+        color = color_al_mover(tablero, movimientos_posibles) if self.simetrias else ROJO
+        state = self.get_state_key(tablero, color)
         
         # Decaimiento de epsilon
         self.epsilon = max(self.min_epsilon, self.epsilon * self.epsilon_decay)
@@ -47,107 +118,141 @@ class QLearningAgent:
         if np.random.random() < self.epsilon:
             movimientos_captura = [m for m in movimientos_posibles if self.es_movimiento_captura(tablero, m)]
             if movimientos_captura:
-                return np.random.choice(movimientos_captura)
-            return np.random.choice(movimientos_posibles)
+                return movimientos_captura[np.random.randint(len(movimientos_captura))]
+            return movimientos_posibles[np.random.randint(len(movimientos_posibles))]
         
         # Explotación con preferencia por capturas
         return self.get_best_action(state, movimientos_posibles, tablero)
 
-    def es_movimiento_captura(self, tablero_actual, tablero_siguiente):
-        """Determina si un movimiento es de captura contando piezas"""
-        piezas_antes = sum(1 for fil in range(FILAS) for col in range(COLUMNAS) 
-                          if tablero_actual.get_pieza(fil, col) != 0)
-        piezas_despues = sum(1 for fil in range(FILAS) for col in range(COLUMNAS) 
-                            if tablero_siguiente.get_pieza(fil, col) != 0)
-        return piezas_antes > piezas_despues
+    def es_movimiento_captura(self, tablero_actual, movimiento):
+        """Determina si un movimiento (origen, destino, capturada) es de captura"""
+        return movimiento[2] is not None
 
     def get_best_action(self, state, movimientos_posibles, tablero_actual):
         """Obtiene la mejor acción con preferencia por capturas"""
         if not movimientos_posibles:
             return None
 
-        if state not in self.q_table:
-            self.q_table[state] = {}
+        # Claves de todos los sucesores, calculadas de una vez sobre la clave actual
+        claves = self.claves_acciones(tablero_actual, movimientos_posibles)
+        capturas = [movimiento[2] is not None for movimiento in movimientos_posibles]
+        num_capturas = capturas.count(True)
+        orden = None
+        if num_capturas:
+            # Priorizar movimientos de captura: van delante y así ganan los empates
+            orden = sorted(range(len(capturas)), key=capturas.__getitem__, reverse=True)
+            claves = [claves[i] for i in orden]
 
-        # Separar movimientos de captura y no captura
-        movimientos_captura = []
-        movimientos_normales = []
-        
-        for action in movimientos_posibles:
-            if self.es_movimiento_captura(tablero_actual, action):
-                movimientos_captura.append(action)
-            else:
-                movimientos_normales.append(action)
-
-        best_value = float('-inf')
-        best_action = None
-
-        # Priorizar movimientos de captura
-        movimientos_a_evaluar = movimientos_captura + movimientos_normales
-        
-        for action in movimientos_a_evaluar:
-            action_key = self.get_action_key(action)
-            if action_key not in self.q_table[state]:
-                # Inicializar con valor más alto para capturas
-                initial_value = 1.0 if action in movimientos_captura else 0.0
-                self.q_table[state][action_key] = initial_value
-            
-            current_value = self.q_table[state][action_key]
-            # Bonus para movimientos de captura
-            if action in movimientos_captura:
-                current_value *= 1.2  # 20% bonus para capturas
-            
-            if current_value > best_value:
-                best_value = current_value
-                best_action = action
+        # Valores Q de todas las acciones en una consulta; si no están,
+        # se inicializan con valor más alto para capturas
+        iniciales = [1.0] * num_capturas + [0.0] * (len(claves) - num_capturas)
+        if self.simetrias and self.simetria(tablero_actual, color_al_mover(tablero_actual, movimientos_posibles))[0]:
+            # Con los colores cambiados la tabla guarda los valores de la posición del otro
+            # bando, con el signo de la recompensa (el punto de vista de BLANCO): aquí se
+            # leen cambiados de signo y no se siembran, ya que serían de la posición de ROJO
+            valores = [inicial if valor is None else -valor for valor, inicial in
+                       zip((self.q_table.consultar(state, clave) for clave in claves), iniciales)]
+        else:
+            valores = self.q_table.obtener_lote(state, claves, iniciales)
+        if num_capturas:
+            valores[:num_capturas] = [valor * 1.2 for valor in valores[:num_capturas]]  # 20% bonus para capturas
 
-        return best_action or np.random.choice(movimientos_posibles)
+        # max e index trabajan sobre la lista entera y devuelven el primero de los empatados
+        mejor_valor = max(valores)
+        if not mejor_valor > float('-inf'):
+            return movimientos_posibles[np.random.randint(len(movimientos_posibles))]
+        mejor = valores.index(mejor_valor)
+        return movimientos_posibles[orden[mejor] if orden else mejor]
 
-    def get_action_key(self, tablero):
-        """Convierte una acción (tablero resultante) en una cadena única"""
-        return self.get_state_key(tablero)
+    def get_action_key(self, tablero, movimiento):
+        """Convierte una acción en la clave del tablero resultante, sin copiar el tablero"""
+        return self.claves_acciones(tablero, (movimiento,))[0]
 
-    def learn(self, state, action, reward, next_state, next_possible_actions):
-        """Actualiza la tabla Q con aprendizaje mejorado"""
-        state_key = self.get_state_key(state)
-        action_key = self.get_action_key(action)
+    def learn(self, state_key, action_key, reward, next_state, next_possible_actions):
+        """
+        Actualiza la tabla Q con aprendizaje mejorado.
+        state_key y action_key se calculan antes de aplicar el movimiento,
+        ya que el tablero se modifica en el sitio.
+        """
         next_state_key = self.get_state_key(next_state)
+        next_actions = []
+        # Las claves de las acciones siguientes solo hacen falta si el estado es conocido
+        if self.q_table.tiene_estado(next_state_key):
+            claves = self.claves_acciones(next_state, next_possible_actions)
+            next_actions = [(clave, next_action[2] is not None)
+                            for clave, next_action in zip(claves, next_possible_actions)]
+        self.learn_claves(state_key, action_key, reward, next_state_key, next_actions)
 
-        if state_key not in self.q_table:
-            self.q_table[state_key] = {}
-        if action_key not in self.q_table[state_key]:
-            self.q_table[state_key][action_key] = 0.0
+    def learn_claves(self, state_key, action_key, reward, next_state_key, next_actions):
+        """
+        Actualización Q a partir de claves ya calculadas.
+        next_actions es una lista de (action_key, es_captura) del estado siguiente.
+        Si el estado siguiente está en el solucionario, su valor exacto sustituye
+        al máximo estimado de la tabla Q.
+        """
+        current_q = self.q_table.obtener(state_key, action_key, 0.0)
 
         # Calcular el valor Q máximo para el siguiente estado con bonus por capturas
         next_max = 0
-        if next_possible_actions:
+        if next_actions:
             next_values = []
-            if next_state_key in self.q_table:
-                for next_action in next_possible_actions:
-                    next_action_key = self.get_action_key(next_action)
-                    if next_action_key in self.q_table[next_state_key]:
-                        value = self.q_table[next_state_key][next_action_key]
-                        if self.es_movimiento_captura(next_state, next_action):
+            if self.q_table.tiene_estado(next_state_key):
+                for next_action_key, es_captura in next_actions:
+                    value = self.q_table.consultar(next_state_key, next_action_key)
+                    if value is not None:
+                        if es_captura:
                             value *= 1.2  # Bonus para capturas futuras
                         next_values.append(value)
             if next_values:
                 next_max = max(next_values)
+        if self.finales is not None:
+            valor = self.valor_final(next_state_key)
+            if valor is not None:
+                next_max = valor
 
         # Actualizar el valor Q con mayor peso en recompensas positivas
-        current_q = self.q_table[state_key][action_key]
         new_q = current_q + self.alpha * (reward + self.gamma * next_max - current_q)
         
         # Ajuste adicional para favorecer estados ganadores
         if reward > 0:
             new_q *= 1.1  # 10% extra para recompensas positivas
         
-        self.q_table[state_key][action_key] = new_q
+        self.q_table.asignar(state_key, action_key, new_q)
+
+    def valor_final(self, state_key):
+        """
+        Valor con el que learn_claves sustituye a next_max para el estado tras el
+        movimiento de ROJO (el del agente): el de valor_exacto, o 0 si la partida
+        ya está decidida en ese estado (la recompensa del movimiento ya cuenta el
+        resultado). None si el estado no está en el solucionario.
+        """
+        motor = Motor.desde_clave(state_key, self.finales.geometria)
+        if motor.ganador() is not None or not motor.generar_movimientos(BLANCO):
+            return 0.0
+        return self.valor_exacto(state_key)
+
+    def valor_exacto(self, state_key):
+        """
+        Valor exacto de un estado con BLANCO al mover según el solucionario, con el
+        signo de calcular_recompensa (que devuelve la recompensa de ROJO cambiada de
+        signo): VALOR_VICTORIA descontado por los movimientos sin captura hasta
+        asegurar el resultado, positivo si gana BLANCO y negativo si pierde; 0 en
+        tablas o None si no está en sus tablas. La clave de estado no incluye el
+        contador de movimientos sin captura, así que se consulta con el contador a cero.
+        """
+        resultado = self.finales.consultar_clave(state_key, BLANCO)
+        if resultado is None:
+            return None
+        resultado, distancia = resultado
+        if resultado == 'tablas':
+            return 0.0
+        valor = VALOR_VICTORIA * self.gamma ** distancia
+        return valor if resultado == 'victoria' else -valor
 
     def registrar_partida(self, resultado, num_movimientos, tiempo_partida, recompensa_total):
         """Registra el resultado de una partida y actualiza las estadísticas"""
         self.total_partidas += 1
-        self.historial_movimientos.append(num_movimientos)
-        self.historial_recompensas.append(recompensa_total)
+        self.partidas.registrar(num_movimientos, recompensa_total)
         
         # Actualizar victorias/derrotas/empates
         if resultado == "victoria":
@@ -176,21 +281,29 @@ class QLearningAgent:
                 "recompensa_promedio": 0.0,
                 "movimientos_promedio": 0.0,
                 "tiempo_promedio": 0.0,
+                "desviacion_recompensa": 0.0,
+                "recompensa_minima": 0.0,
+                "recompensa_maxima": 0.0,
                 "ultimas_recompensas": [],
                 "ultimos_movimientos": []
             }
-            
+
+        recompensas, movimientos = self.partidas.recompensas, self.partidas.movimientos
+        ultimas_recompensas, ultimos_movimientos = self.partidas.ultimas(10)
         return {
             "total_partidas": self.total_partidas,
             "victorias": self.victorias,
             "derrotas": self.derrotas,
             "empates": self.empates,
             "tasa_victorias": (self.victorias / self.total_partidas) * 100,
-            "recompensa_promedio": sum(self.historial_recompensas) / len(self.historial_recompensas) if self.historial_recompensas else 0,
-            "movimientos_promedio": sum(self.historial_movimientos) / len(self.historial_movimientos) if self.historial_movimientos else 0,
+            "recompensa_promedio": recompensas.media,
+            "movimientos_promedio": movimientos.media,
             "tiempo_promedio": self.tiempo_promedio_partida,
-            "ultimas_recompensas": self.historial_recompensas[-10:] if self.historial_recompensas else [],
-            "ultimos_movimientos": self.historial_movimientos[-10:] if self.historial_movimientos else []
+            "desviacion_recompensa": recompensas.desviacion(),
+            "recompensa_minima": recompensas.minimo if recompensas.n else 0.0,
+            "recompensa_maxima": recompensas.maximo if recompensas.n else 0.0,
+            "ultimas_recompensas": ultimas_recompensas,
+            "ultimos_movimientos": ultimos_movimientos
         }
 
     def mostrar_estadisticas_consola(self):
@@ -205,67 +318,220 @@ class QLearningAgent:
         print(f"Tasa de Victorias: {stats['tasa_victorias']:.1f}%")
         print(f"Movimientos Promedio: {stats['movimientos_promedio']:.1f}")
         print(f"Tiempo Promedio por Partida: {stats['tiempo_promedio']:.1f}s")
-        print(f"Recompensa Promedio: {stats['recompensa_promedio']:.1f}")
+        print(f"Recompensa Promedio: {stats['recompensa_promedio']:.1f} ± {stats['desviacion_recompensa']:.1f} "
+              f"(mín. {stats['recompensa_minima']:.1f}, máx. {stats['recompensa_maxima']:.1f})")
+        tabla = self.q_table.obtener_estadisticas()
+        print(f"Tabla Q: {tabla['estados']} estados, {tabla['entradas']} acciones")
+        if 'capacidad' in tabla:
+            print(f"Ocupación: {tabla['ocupacion']:.1f}% de {tabla['capacidad']} ranuras "
+                  f"({tabla['memoria_mb']:.1f} MB), desalojadas: {tabla['desalojadas']}")
         print("=" * 40)
 
     def save_q_table(self):
-        """Guarda la tabla Q y las estadísticas en archivos"""
+        """Guarda la tabla Q y las estadísticas en archivos de forma atómica"""
         # Guardar tabla Q
-        with open('q_table.pkl', 'wb') as f:
-            pickle.dump(self.q_table, f)
+        if isinstance(self.q_table, TablaQMapeada):
+            if self.q_table.escritura:
+                # Se mezcla con el archivo actual, que otro proceso puede haber reescrito
+                # (salvo si cargar_dict sustituyó el contenido: entonces ruta es None)
+                tabla = self.q_table
+                base = TablaQMapeada(tabla.ruta) if tabla.ruta and os.path.exists(tabla.ruta) else tabla
+                guardar_atomico(self.archivo_q_table, (base, tabla.cambios), escribir_mezcla)
+                tabla.abrir(self.archivo_q_table)
+        else:
+            guardar_atomico(self.archivo_q_table, self.q_table.a_dict())
         
         # Guardar estadísticas
         estadisticas = {
             'victorias': self.victorias,
             'derrotas': self.derrotas,
             'empates': self.empates,
-            'historial_recompensas': self.historial_recompensas,
-            'historial_movimientos': self.historial_movimientos,
+            'partidas': self.partidas.a_dict(),
             'tiempo_promedio_partida': self.tiempo_promedio_partida,
             'total_partidas': self.total_partidas
         }
-        with open('estadisticas.pkl', 'wb') as f:
-            pickle.dump(estadisticas, f)
+        guardar_atomico(self.archivo_estadisticas, estadisticas)
+
+    def permitir_escritura(self, permitir=True):
+        """
+        Una tabla .qmap es de solo lectura salvo que se permita escribirla (ver
+        TablaQMapeada). Devuelve el valor anterior para poder restaurarlo
+        """
+        if not isinstance(self.q_table, TablaQMapeada):
+            return True
+        anterior = self.q_table.escritura
+        self.q_table.escritura = permitir
+        return anterior
 
     def load_q_table(self):
         """Carga la tabla Q y las estadísticas desde archivos si existen"""
-        if os.path.exists('q_table.pkl'):
-            with open('q_table.pkl', 'rb') as f:
-                self.q_table = pickle.load(f)
+        if isinstance(self.q_table, TablaQMapeada):
+            if os.path.exists(self.archivo_q_table):
+                self.q_table.abrir(self.archivo_q_table)
+        elif os.path.exists(self.archivo_q_table):
+            with open(self.archivo_q_table, 'rb') as f:
+                self.q_table.cargar_dict(migrar_q_table(pickle.load(f)))
         
-        if os.path.exists('estadisticas.pkl'):
-            with open('estadisticas.pkl', 'rb') as f:
+        if os.path.exists(self.archivo_estadisticas):
+            with open(self.archivo_estadisticas, 'rb') as f:
                 estadisticas = pickle.load(f)
                 self.victorias = estadisticas['victorias']
                 self.derrotas = estadisticas['derrotas']
                 self.empates = estadisticas['empates']
-                self.historial_recompensas = estadisticas['historial_recompensas']
-                self.historial_movimientos = estadisticas['historial_movimientos']
+                # Los archivos anteriores guardan las listas historial_* completas
+                self.partidas.cargar_dict(estadisticas.get('partidas', estadisticas))
                 self.tiempo_promedio_partida = estadisticas['tiempo_promedio_partida']
                 self.total_partidas = estadisticas['total_partidas']
 
+def archivo_simetrias(ruta):
+    """Archivo de un agente con claves simétricas: q_table.pkl -> q_table_simetrias.pkl"""
+    base, extension = os.path.splitext(ruta)
+    return ruta if base.endswith('_simetrias') else f"{base}_simetrias{extension}"
+
+
+def color_al_mover(tablero, movimientos):
+    """Color de las piezas que mueven (ROJO si no hay movimientos)"""
+    if not movimientos:
+        return ROJO
+    return BLANCO if tablero.motor.tipo_pieza(movimientos[0][0]) < 2 else ROJO
+
+
+def guardar_atomico(ruta, objeto, escribir=None):
+    """
+    Serializa el objeto en un temporal del mismo directorio y lo renombra sobre la ruta,
+    de modo que un fallo a mitad de escritura nunca deja un archivo truncado.
+    escribir(f, objeto) cambia el formato (por defecto, pickle).
+    """
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    fd, temporal = tempfile.mkstemp(prefix='.' + os.path.basename(ruta) + '.', suffix='.tmp', dir=directorio)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if escribir is None:
+                pickle.dump(objeto, f, protocol=pickle.HIGHEST_PROTOCOL)
+            else:
+                escribir(f, objeto)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp crea el archivo con permisos 0600; usar los habituales según la umask
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temporal, 0o666 & ~umask)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+class PoliticaCheckpoint:
+    """
+    Decide cuándo guardar la tabla Q: cada N partidas, cada T segundos
+    y al salir del proceso (salida normal o SIGTERM).
+    Un valor de 0 o None desactiva el criterio correspondiente.
+    """
+    def __init__(self, agente, cada_partidas=100, cada_segundos=60.0):
+        self.agente = agente
+        self.cada_partidas = cada_partidas
+        self.cada_segundos = cada_segundos
+        self.partidas_pendientes = 0
+        self.ultimo_guardado = time.time()
+        self.guardados = 0
+        self.salida_instalada = False
+        self.manejador_anterior = None
+
+    def partida_terminada(self):
+        """Registra el final de una partida y guarda si toca"""
+        self.partidas_pendientes += 1
+        if self.toca_guardar():
+            self.guardar()
+
+    def toca_guardar(self):
+        if self.partidas_pendientes == 0:
+            return False
+        if self.cada_partidas and self.partidas_pendientes >= self.cada_partidas:
+            return True
+        if self.cada_segundos and time.time() - self.ultimo_guardado >= self.cada_segundos:
+            return True
+        return False
+
+    def guardar(self):
+        self.agente.save_q_table()
+        self.partidas_pendientes = 0
+        self.ultimo_guardado = time.time()
+        self.guardados += 1
+
+    def guardar_pendiente(self):
+        """Guarda solo si hay partidas sin guardar desde el último checkpoint"""
+        if self.partidas_pendientes:
+            self.guardar()
+
+    def instalar_salida(self):
+        """Guarda lo pendiente al salir, también si el proceso recibe SIGTERM"""
+        if self.salida_instalada:
+            return
+        self.salida_instalada = True
+        atexit.register(self.guardar_pendiente)
+        if threading.current_thread() is threading.main_thread():
+            # SIGTERM pasa a ser SystemExit para que se ejecuten los bloques finally y atexit
+            self.manejador_anterior = signal.signal(signal.SIGTERM, _salir_por_senal)
+
+    def retirar_salida(self):
+        """Deshace instalar_salida: quita el guardado de atexit y restaura el manejador de SIGTERM"""
+        if not self.salida_instalada:
+            return
+        self.salida_instalada = False
+        atexit.unregister(self.guardar_pendiente)
+        if self.manejador_anterior is not None:
+            signal.signal(signal.SIGTERM, self.manejador_anterior)
+            self.manejador_anterior = None
+
+
+def _salir_por_senal(signum, frame):
+    sys.exit(128 + signum)
+
+
+def convertir_clave(cadena):
+    """
+    Convierte una clave antigua ('0,1N,0,2K,...', una ficha por casilla)
+    en la clave entera empaquetada que devuelve Motor.clave
+    """
+    fichas = cadena.split(',')
+    n = len(fichas)  # Una ficha por casilla: el número de casillas sale de la propia clave
+    clave = 0
+    for i, ficha in enumerate(fichas):
+        if ficha == '0':
+            continue
+        tipo = (0 if ficha[0] == '1' else 2) + (1 if ficha[1] == 'K' else 0)
+        clave |= 1 << (i + tipo * n)
+    return clave
+
+
+def migrar_q_table(q_table):
+    """Convierte una tabla Q con claves de texto al formato de claves enteras"""
+    if not any(isinstance(estado, str) for estado in q_table):
+        return q_table
+    migrada = {}
+    for estado, acciones in q_table.items():
+        if isinstance(estado, str):
+            estado = convertir_clave(estado)
+        destino = migrada.setdefault(estado, {})
+        for accion, valor in acciones.items():
+            if isinstance(accion, str):
+                accion = convertir_clave(accion)
+            destino[accion] = valor
+    return migrada
+
+
 def calcular_recompensa(tablero, movimiento_captura, movimientos_sin_captura):
     """Calcula la recompensa para un estado dado"""
     recompensa = 0
     
-    # Contar piezas y reyes
-    piezas_rojas = 0
-    piezas_blancas = 0
-    reyes_rojos = 0
-    reyes_blancos = 0
-    
-    for fil in range(FILAS):
-        for col in range(COLUMNAS):
-            pieza = tablero.get_pieza(fil, col)
-            if pieza != 0:
-                if pieza.color == ROJO:
-                    piezas_rojas += 1
-                    if pieza.king:
-                        reyes_rojos += 1
-                else:
-                    piezas_blancas += 1
-                    if pieza.king:
-                        reyes_blancos += 1
+    # Contar piezas y reyes (contadores del tablero, sin recorrer las casillas)
+    piezas_rojas = tablero.ROJO_left
+    piezas_blancas = tablero.BLANCO_left
+    reyes_rojos = tablero.ROJO_kings
+    reyes_blancos = tablero.BLANCO_kings
+    filas, columnas = tablero.filas, tablero.columnas
 
     # Recompensa base por diferencia de piezas
     diferencia_piezas = piezas_rojas - piezas_blancas
@@ -285,32 +551,38 @@ def calcular_recompensa(tablero, movimiento_captura, movimientos_sin_captura):
     if movimientos_sin_captura > 5:
         recompensa -= (movimientos_sin_captura - 5) * 10
 
-    # Bonus por posición y avance
-    for fil in range(FILAS):
-        for col in range(COLUMNAS):
-            pieza = tablero.get_pieza(fil, col)
-            if pieza != 0 and pieza.color == ROJO:
-                if not pieza.king:
-                    # Bonus por avance
-                    recompensa += (FILAS - fil - 1) * 5
-                    
-                    # Bonus por proximidad a coronación
-                    if fil >= FILAS - 2:
-                        recompensa += 20
-                else:
-                    # Bonus por control del centro
-                    if 1 <= fil <= FILAS-2 and 1 <= col <= COLUMNAS-2:
-                        recompensa += 15
+    # Bonus por posición y avance (solo se visitan las piezas rojas)
+    motor = tablero.motor
+    posiciones = motor.geometria.posiciones
+    peones = motor.rojas
+    while peones:
+        bit = peones & -peones
+        peones ^= bit
+        fil, col = posiciones[bit.bit_length() - 1]
+        # Bonus por avance
+        recompensa += (filas - fil - 1) * 5
+        
+        # Bonus por proximidad a coronación
+        if fil >= filas - 2:
+            recompensa += 20
+    reyes = motor.rojas_reyes
+    while reyes:
+        bit = reyes & -reyes
+        reyes ^= bit
+        fil, col = posiciones[bit.bit_length() - 1]
+        # Bonus por control del centro
+        if 1 <= fil <= filas-2 and 1 <= col <= columnas-2:
+            recompensa += 15
 
     # Victoria/Derrota
     if piezas_rojas > 0 and piezas_blancas == 0:  # Victoria
-        recompensa += 200
+        recompensa += VALOR_VICTORIA
         if movimientos_sin_captura < 20:  # Victoria rápida
             recompensa += (20 - movimientos_sin_captura) * 5
         if piezas_rojas >= 2:  # Victoria dominante
             recompensa += piezas_rojas * 20
     elif piezas_rojas == 0 and piezas_blancas > 0:  # Derrota
-        recompensa -= 200
+        recompensa -= VALOR_VICTORIA
         recompensa -= piezas_blancas * 10
 
     # Penalización por tendencia al empate
@@ -318,3 +590,13 @@ def calcular_recompensa(tablero, movimiento_captura, movimientos_sin_captura):
         recompensa -= (movimientos_sin_captura - 9) * 15
 
     return -recompensa
+
+
+if __name__ == "__main__":
+    # Migra un q_table.pkl con claves de texto al formato de claves enteras
+    ruta = sys.argv[1] if len(sys.argv) > 1 else 'q_table.pkl'
+    with open(ruta, 'rb') as f:
+        q_table = pickle.load(f)
+    migrada = migrar_q_table(q_table)
+    guardar_atomico(ruta, migrada)
+    print(f"Tabla Q migrada: {len(migrada)} estados en {ruta}")
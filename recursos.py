@@ -0,0 +1,14 @@
+from constantes import resource_path
+
+# Recursos de dibujado. pygame solo se importa cuando algo se dibuja de verdad,
+# así el motor y el entrenamiento funcionan sin pygame instalado.
+_corona = None
+
+def get_corona():
+    """Carga y escala la imagen de la corona la primera vez que se dibuja un rey"""
+    global _corona
+    if _corona is None:
+        import pygame
+        corona_img_path = resource_path("corona.png")
+        _corona = pygame.transform.scale(pygame.image.load(corona_img_path), (45, 25))
+    return _corona
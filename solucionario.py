@@ -0,0 +1,447 @@
+"""
+Solucionario exacto por análisis retrógrado para tableros pequeños.
+
+Enumera todas las posiciones con hasta max_piezas piezas por bando y calcula, para
+cada una y cada bando al mover, si gana, pierde o es tablas y a cuántos movimientos
+sin captura está el resultado, respetando la regla de MAX_MOVIMIENTOS_SIN_CAPTURA.
+
+    python solucionario.py                         # 4x4 con 2 piezas por bando -> solucionario.tab
+    python solucionario.py --filas 6 --columnas 6 --piezas 2
+    python solucionario.py --comparar q_table.pkl  # aciertos del agente frente a la jugada exacta
+    python solucionario.py --verificar             # valor exacto y recompensa con el mismo signo
+
+Las posiciones se agrupan por número de piezas de cada bando (una captura lleva a
+un grupo ya resuelto; una coronación se queda en el mismo) y dentro de cada grupo
+se indexan con el sistema combinatorio, así que consultar una posición es calcular
+su índice y leer un byte. El archivo .tab se proyecta en memoria al cargarlo, así
+que la búsqueda y el entrenamiento pueden consultarlo como base de datos de finales
+sin leerlo entero.
+"""
+import sys
+import time
+import struct
+import argparse
+from itertools import combinations
+from math import comb
+import numpy as np
+from constantes import *
+from motor import Motor, obtener_geometria, contar_bits
+from qlearning import guardar_atomico
+
+# Códigos de la tabla (un byte por posición y bando al mover)
+TABLAS = 0
+VICTORIA = 1     # VICTORIA + d: gana con d movimientos sin captura hasta asegurarlo
+DERROTA = 65     # DERROTA + d: pierde, aguantando como mucho d movimientos sin captura
+# Movimientos sin captura que se pueden jugar antes de que la partida sea tablas
+LIMITE = MAX_MOVIMIENTOS_SIN_CAPTURA - 1
+
+BANDOS = (BLANCO, ROJO)
+
+# Archivo .tab: cabecera (magia, filas, columnas, max_piezas) y después los códigos
+# de cada grupo en el orden de Solucionario.grupos()
+MAGIA_TABLAS = b'DAMASF01'
+CABECERA_TABLAS = struct.Struct('<8sIII')
+TAM_CABECERA_TABLAS = 64
+
+
+def decodificar(codigo, contador=0):
+    """(resultado, distancia) de un código con contador movimientos sin captura ya jugados"""
+    if codigo == TABLAS:
+        return 'tablas', None
+    if codigo < DERROTA:
+        distancia = codigo - VICTORIA
+        return ('victoria' if contador + distancia <= LIMITE else 'tablas'), distancia
+    distancia = codigo - DERROTA
+    return ('derrota' if contador + distancia <= LIMITE else 'tablas'), distancia
+
+
+class IndiceGrupo:
+    """
+    Índice de las posiciones con blancas piezas blancas y rojas piezas rojas.
+    Cada reparto entre peones y reyes ocupa un tramo; dentro del tramo el índice
+    combina el rango combinatorio de los peones blancos, los reyes blancos, los
+    peones rojos y los reyes rojos, cada grupo entre las casillas oscuras que dejan libres los anteriores.
+    """
+    def __init__(self, geometria, blancas, rojas):
+        self.geometria = geometria
+        self.blancas = blancas
+        self.rojas = rojas
+        self.casillas = [i for i in range(geometria.n) if geometria.oscuras >> i & 1]
+        m = len(self.casillas)
+        self.inicio = {}
+        self.tamano = 0
+        for reyes_blancos in range(blancas + 1):
+            for reyes_rojos in range(rojas + 1):
+                peones_blancos, peones_rojos = blancas - reyes_blancos, rojas - reyes_rojos
+                self.inicio[(reyes_blancos, reyes_rojos)] = self.tamano
+                self.tamano += (comb(m, peones_blancos) * comb(m - peones_blancos, reyes_blancos) *
+                                comb(m - blancas, peones_rojos) * comb(m - blancas - peones_rojos, reyes_rojos))
+
+    def _rango(self, bits, libres):
+        """Rango combinatorio de bits entre las casillas libres (recorre solo las piezas)"""
+        rango = k = 0
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            k += 1
+            rango += comb(contar_bits(libres & (bit - 1)), k)
+        return rango
+
+    def indice(self, blancas, blancas_reyes, rojas, rojas_reyes):
+        """Hash perfecto de la posición dentro del grupo"""
+        libres = self.geometria.oscuras
+        indice = 0
+        for bits in (blancas, blancas_reyes, rojas, rojas_reyes):
+            indice = indice * comb(contar_bits(libres), contar_bits(bits)) + self._rango(bits, libres)
+            libres &= ~bits
+        return self.inicio[(contar_bits(blancas_reyes), contar_bits(rojas_reyes))] + indice
+
+    def posiciones(self):
+        """Recorre (indice, blancas, blancas_reyes, rojas, rojas_reyes) de todo el grupo"""
+        casillas = self.casillas
+        for reyes_blancos, reyes_rojos in self.inicio:
+            cuantas = (self.blancas - reyes_blancos, reyes_blancos, self.rojas - reyes_rojos, reyes_rojos)
+            for bitboards in self._repartos(frozenset(casillas), cuantas):
+                yield (self.indice(*bitboards),) + bitboards
+
+    def _repartos(self, libres, cuantas):
+        if not cuantas:
+            yield ()
+            return
+        for elegidas in combinations(sorted(libres), cuantas[0]):
+            bits = sum(1 << i for i in elegidas)
+            for resto in self._repartos(libres - set(elegidas), cuantas[1:]):
+                yield (bits,) + resto
+
+
+class Solucionario:
+    """
+    Tablas de resultado exacto de un tamaño de tablero: {(blancas, rojas): array (2, tamaño)}
+    de códigos, con la fila 0 para BLANCO al mover y la 1 para ROJO.
+    Al cargarlo de un .tab las tablas son vistas de un np.memmap.
+    """
+    def __init__(self, geometria=None, max_piezas=2):
+        self.geometria = geometria if geometria is not None else obtener_geometria()
+        self.max_piezas = max_piezas
+        self.indices = {}
+        self.tablas = {}
+        self.consultas = 0
+        self.aciertos = 0
+
+    def grupos(self):
+        """Grupos (blancas, rojas) en orden de resolución: menos piezas primero"""
+        return sorted(((b, r) for b in range(1, self.max_piezas + 1) for r in range(1, self.max_piezas + 1)),
+                      key=lambda grupo: (grupo[0] + grupo[1], grupo))
+
+    def _indice(self, grupo):
+        if grupo not in self.indices:
+            self.indices[grupo] = IndiceGrupo(self.geometria, *grupo)
+        return self.indices[grupo]
+
+    def resolver(self, mostrar=False):
+        for grupo in self.grupos():
+            inicio = time.perf_counter()
+            self.tablas[grupo] = self._resolver_grupo(grupo)
+            if mostrar:
+                codigos = self.tablas[grupo]
+                print(f"{grupo[0]} blancas contra {grupo[1]} rojas: {codigos.size} posiciones, "
+                      f"{np.count_nonzero((codigos >= VICTORIA) & (codigos < DERROTA))} victorias, "
+                      f"{np.count_nonzero(codigos >= DERROTA)} derrotas, "
+                      f"{np.count_nonzero(codigos == TABLAS)} tablas ({time.perf_counter() - inicio:.1f}s)")
+        self.consultas = self.aciertos = 0
+        return self
+
+    def _resolver_grupo(self, grupo):
+        """
+        Análisis retrógrado de un grupo. Las capturas salen a grupos ya resueltos
+        con el contador a cero; el resto de movimientos se quedan en el grupo y
+        cuestan uno. Se resuelve por capas: en la capa k ganan las posiciones con
+        algún movimiento a una derrota ya conocida y pierden aquellas en las que
+        todos los movimientos llevan a victorias del rival. Lo que no se resuelve
+        en LIMITE capas es tablas.
+        """
+        indice = self._indice(grupo)
+        tamano = indice.tamano
+        n = 2 * tamano  # Posición idx con BLANCO al mover en idx, con ROJO en tamano + idx
+        filas, hijos = [], []
+        gana_captura = np.zeros(n, dtype=bool)    # Alguna captura gana ya
+        tablas_captura = np.zeros(n, dtype=bool)  # Alguna captura lleva a tablas
+        sin_movimientos = np.zeros(n, dtype=bool)
+        motor = Motor(vacio=True, geometria=self.geometria)
+        for idx, blancas, blancas_reyes, rojas, rojas_reyes in indice.posiciones():
+            for lado, color in enumerate(BANDOS):
+                fila = lado * tamano + idx
+                motor.blancas, motor.blancas_reyes, motor.rojas, motor.rojas_reyes = \
+                    blancas, blancas_reyes, rojas, rojas_reyes
+                movimientos = motor.generar_movimientos(color)
+                if not movimientos:
+                    sin_movimientos[fila] = True
+                for movimiento in movimientos:
+                    deshacer = motor.hacer_movimiento(movimiento)
+                    if movimiento[2] is None:
+                        filas.append(fila)
+                        hijos.append((1 - lado) * tamano + indice.indice(
+                            motor.blancas, motor.blancas_reyes, motor.rojas, motor.rojas_reyes))
+                    else:
+                        resultado = self._resultado_tras_captura(motor, color)
+                        if resultado == 'victoria':
+                            gana_captura[fila] = True
+                        elif resultado == 'tablas':
+                            tablas_captura[fila] = True
+                    motor.deshacer_movimiento(deshacer)
+
+        filas = np.array(filas, dtype=np.int64)
+        hijos = np.array(hijos, dtype=np.int64)
+        grado = np.bincount(filas, minlength=n)
+        codigos = np.zeros(n, dtype=np.uint8)
+        resuelta = gana_captura | sin_movimientos | ((grado == 0) & ~tablas_captura)
+        codigos[gana_captura] = VICTORIA
+        codigos[resuelta & ~gana_captura] = DERROTA
+        # Sin capturas que ganen o empaten, solo puede perder si todo lo demás pierde
+        puede_perder = ~gana_captura & ~tablas_captura
+        for capa in range(1, LIMITE + 1):
+            derrotas = resuelta & (codigos >= DERROTA)
+            victorias = resuelta & (codigos >= VICTORIA) & (codigos < DERROTA)
+            hacia_derrota = np.bincount(filas, weights=derrotas[hijos], minlength=n) > 0
+            hacia_victoria = np.bincount(filas, weights=victorias[hijos], minlength=n)
+            gana = ~resuelta & hacia_derrota
+            pierde = ~resuelta & puede_perder & (grado > 0) & (hacia_victoria == grado)
+            if not (gana.any() or pierde.any()):
+                break
+            codigos[gana] = VICTORIA + capa
+            codigos[pierde] = DERROTA + capa
+            resuelta |= gana | pierde
+        return codigos.reshape(2, tamano)
+
+    def _resultado_tras_captura(self, motor, color):
+        """Resultado para color tras su captura, que deja el contador a cero"""
+        rival = ROJO if color == BLANCO else BLANCO
+        resultado = self.consultar(motor, rival)
+        if resultado is None:
+            raise ValueError("Una captura lleva a un grupo sin resolver")
+        return {'victoria': 'derrota', 'derrota': 'victoria', 'tablas': 'tablas'}[resultado[0]]
+
+    def codigo(self, motor, color):
+        """Código de la posición con color al mover, o None si está fuera de las tablas"""
+        return self._codigo(motor.blancas, motor.blancas_reyes, motor.rojas, motor.rojas_reyes, color)
+
+    def _codigo(self, blancas, blancas_reyes, rojas, rojas_reyes, color):
+        self.consultas += 1
+        grupo = (contar_bits(blancas | blancas_reyes), contar_bits(rojas | rojas_reyes))
+        tabla = self.tablas.get(grupo)
+        if tabla is None:
+            return None
+        self.aciertos += 1
+        return int(tabla[BANDOS.index(color), self._indice(grupo).indice(blancas, blancas_reyes, rojas, rojas_reyes)])
+
+    def consultar(self, motor, color, contador=0):
+        """
+        Resultado exacto para color al mover tras contador movimientos sin captura:
+        (resultado, distancia) con resultado 'victoria', 'derrota' o 'tablas'.
+        Returns:
+            None si la posición tiene más piezas de las resueltas
+        """
+        if not (motor.blancas | motor.blancas_reyes):
+            return ('victoria', 0) if color == ROJO else ('derrota', 0)
+        if not (motor.rojas | motor.rojas_reyes):
+            return ('victoria', 0) if color == BLANCO else ('derrota', 0)
+        codigo = self.codigo(motor, color)
+        return None if codigo is None else decodificar(codigo, contador)
+
+    def consultar_clave(self, clave, color, contador=0):
+        """consultar a partir de una clave de Motor.clave() (p. ej. un estado de la tabla Q)"""
+        return self.consultar(Motor.desde_clave(clave, self.geometria), color, contador)
+
+    def obtener_estadisticas(self):
+        return {
+            "consultas": self.consultas,
+            "aciertos": self.aciertos,
+            "tasa_aciertos": (self.aciertos / self.consultas) * 100 if self.consultas else 0.0
+        }
+
+    def valorar_movimientos(self, motor, color, contador=0):
+        """
+        Lista de (movimiento, resultado, distancia) para color, o None si la
+        posición no está en las tablas. La distancia cuenta los movimientos sin
+        captura hasta asegurar el resultado, y es 0 para las capturas.
+        """
+        if self.consultar(motor, color, contador) is None:
+            return None
+        rival = ROJO if color == BLANCO else BLANCO
+        contrario = {'victoria': 'derrota', 'derrota': 'victoria', 'tablas': 'tablas'}
+        valoraciones = []
+        for movimiento in motor.generar_movimientos(color):
+            captura = movimiento[2] is not None
+            siguiente = 0 if captura else contador + 1
+            if siguiente >= MAX_MOVIMIENTOS_SIN_CAPTURA:
+                valoraciones.append((movimiento, 'tablas', None))
+                continue
+            deshacer = motor.hacer_movimiento(movimiento)
+            resultado, distancia = self.consultar(motor, rival, siguiente)
+            motor.deshacer_movimiento(deshacer)
+            if distancia is not None:
+                # Una captura asegura el resultado (vuelve a empezar la cuenta)
+                distancia = 0 if captura else distancia + 1
+            valoraciones.append((movimiento, contrario[resultado], distancia))
+        return valoraciones
+
+    def mejor_movimiento(self, motor, color, contador=0):
+        """
+        Jugada exacta: la victoria más corta, si no tablas y si no la derrota más larga.
+        Returns:
+            None si la posición no está en las tablas o no hay movimientos
+        """
+        valoraciones = self.valorar_movimientos(motor, color, contador)
+        if not valoraciones:
+            return None
+
+        def preferencia(valoracion):
+            _, resultado, distancia = valoracion
+            if resultado == 'victoria':
+                return (2, -distancia)
+            if resultado == 'tablas':
+                return (1, 0)
+            return (0, distancia)
+        return max(valoraciones, key=preferencia)[0]
+
+    def guardar(self, ruta):
+        guardar_atomico(ruta, self, _escribir_tablas)
+
+    @classmethod
+    def cargar(cls, ruta, filas_iniciales=None):
+        """Proyecta en memoria un .tab: solo se leen del disco las páginas que se consultan"""
+        mapa = np.memmap(ruta, dtype=np.uint8, mode='r')
+        magia, filas, columnas, max_piezas = CABECERA_TABLAS.unpack_from(mapa)
+        if magia != MAGIA_TABLAS:
+            raise ValueError(f"{ruta} no es un archivo de solucionario")
+        solucionario = cls(obtener_geometria(filas, columnas, filas_iniciales), max_piezas)
+        desplazamiento = TAM_CABECERA_TABLAS
+        for grupo in solucionario.grupos():
+            tamano = solucionario._indice(grupo).tamano
+            solucionario.tablas[grupo] = mapa[desplazamiento:desplazamiento + 2 * tamano].reshape(2, tamano)
+            desplazamiento += 2 * tamano
+        return solucionario
+
+
+def _escribir_tablas(f, solucionario):
+    g = solucionario.geometria
+    f.write(CABECERA_TABLAS.pack(MAGIA_TABLAS, g.filas, g.columnas, solucionario.max_piezas)
+            .ljust(TAM_CABECERA_TABLAS, b'\0'))
+    for grupo in solucionario.grupos():
+        f.write(np.ascontiguousarray(solucionario.tablas[grupo], dtype=np.uint8).tobytes())
+
+
+def archivo_solucionario(geometria=None):
+    """solucionario.tab para el tablero por defecto, solucionario_FxC.tab para los demás"""
+    if geometria is None or (geometria.filas, geometria.columnas) == (FILAS, COLUMNAS):
+        return 'solucionario.tab'
+    return f'solucionario_{geometria.filas}x{geometria.columnas}.tab'
+
+
+def comparar_agente(solucionario, agente, color=ROJO):
+    """
+    Porcentaje de posiciones de las tablas (con el contador a cero) en las que la
+    acción que elige el agente conserva el mejor resultado posible. Usa
+    get_best_action, que añade a la tabla Q del agente los valores iniciales que falten.
+    """
+    from tablero import Tablero
+    orden = {'derrota': 0, 'tablas': 1, 'victoria': 2}
+    aciertos = total = 0
+    motor = Motor(vacio=True, geometria=solucionario.geometria)
+    for grupo in solucionario.grupos():
+        for _, blancas, blancas_reyes, rojas, rojas_reyes in solucionario._indice(grupo).posiciones():
+            motor.blancas, motor.blancas_reyes, motor.rojas, motor.rojas_reyes = \
+                blancas, blancas_reyes, rojas, rojas_reyes
+            valoraciones = solucionario.valorar_movimientos(motor, color)
+            if not valoraciones:
+                continue
+            tablero = Tablero(motor.copiar())
+            elegido = agente.get_best_action(agente.get_state_key(tablero, color),
+                                             [movimiento for movimiento, _, _ in valoraciones], tablero)
+            mejor = max(orden[resultado] for _, resultado, _ in valoraciones)
+            aciertos += any(movimiento == elegido and orden[resultado] == mejor
+                            for movimiento, resultado, _ in valoraciones)
+            total += 1
+    return (aciertos / total) * 100 if total else 0.0
+
+
+def verificar_signos(solucionario, agente):
+    """
+    Comprueba en las posiciones decididas (las que quedan al capturar la última
+    pieza de un bando en cada posición de las tablas) que QLearningAgent.valor_exacto
+    tiene el signo de calcular_recompensa y que valor_final no vuelve a contar el
+    resultado. Returns: (posiciones comprobadas, lista de errores)
+    """
+    from tablero import Tablero
+    from qlearning import calcular_recompensa
+    errores = []
+    comprobadas = 0
+    motor = Motor(vacio=True, geometria=solucionario.geometria)
+    for grupo in solucionario.grupos():
+        for _, blancas, blancas_reyes, rojas, rojas_reyes in solucionario._indice(grupo).posiciones():
+            decididas = []
+            if grupo[0] == 1:
+                decididas.append((0, 0, rojas, rojas_reyes))
+            if grupo[1] == 1:
+                decididas.append((blancas, blancas_reyes, 0, 0))
+            for bitboards in decididas:
+                motor.blancas, motor.blancas_reyes, motor.rojas, motor.rojas_reyes = bitboards
+                motor.recalcular_hash()
+                motor.recalcular_puntos()
+                clave = motor.clave()
+                exacto = agente.valor_exacto(clave)
+                recompensa = calcular_recompensa(Tablero(motor.copiar()), True, 0)
+                if exacto * recompensa <= 0:
+                    errores.append(f"{motor!r}: valor exacto {exacto} y recompensa {recompensa}")
+                if agente.valor_final(clave) != 0.0:
+                    errores.append(f"{motor!r}: valor_final {agente.valor_final(clave)} en una posición terminal")
+                comprobadas += 1
+    return comprobadas, errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solucionario exacto por análisis retrógrado")
+    parser.add_argument("--filas", type=int, default=FILAS)
+    parser.add_argument("--columnas", type=int, default=COLUMNAS)
+    parser.add_argument("--piezas", type=int, default=2, help="máximo de piezas por bando")
+    parser.add_argument("--salida", help="archivo .tab (por defecto, solucionario.tab o solucionario_FxC.tab)")
+    parser.add_argument("--comparar", metavar="Q_TABLE", help="tabla Q cuyo agente se compara con la jugada exacta")
+    parser.add_argument("--verificar", action="store_true",
+                        help="comprobar que el valor exacto y la recompensa coinciden en signo")
+    args = parser.parse_args()
+
+    geometria = obtener_geometria(args.filas, args.columnas)
+    inicio = time.perf_counter()
+    solucionario = Solucionario(geometria, args.piezas).resolver(mostrar=True)
+    salida = args.salida or archivo_solucionario(geometria)
+    solucionario.guardar(salida)
+    print(f"Solucionario guardado en {salida} ({time.perf_counter() - inicio:.1f}s)")
+
+    inicial = Motor(geometria=geometria)
+    if solucionario.consultar(inicial, ROJO) is not None:
+        resultado, distancia = solucionario.consultar(inicial, ROJO)
+        print(f"Posición inicial con ROJO al mover: {resultado}" +
+              (f" en {distancia} movimientos sin captura" if distancia is not None else ""))
+
+    if args.comparar:
+        from qlearning import QLearningAgent
+        agente = QLearningAgent(archivo_q_table=args.comparar, archivo_estadisticas='')
+        agente.load_q_table()
+        print(f"El agente elige la jugada exacta en el {comparar_agente(solucionario, agente):.1f}% de las posiciones")
+
+    if args.verificar:
+        from qlearning import QLearningAgent
+        agente = QLearningAgent(archivo_estadisticas='')
+        agente.finales = solucionario
+        comprobadas, errores = verificar_signos(solucionario, agente)
+        if errores:
+            print(f"\nVERIFICACIÓN FALLIDA ({len(errores)} errores):")
+            for error in errores[:10]:
+                print(error)
+            return 1
+        print(f"Verificación correcta: {comprobadas} posiciones decididas con el signo de la recompensa")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,611 @@
+"""
+Almacenes de la tabla Q. Los dos tienen la misma interfaz, que es la que usa QLearningAgent:
+
+    TablaQ           diccionario {estado: {accion: valor}} sin límite (el formato de q_table.pkl)
+    TablaQCompacta   direccionamiento abierto sobre arrays, con límite de memoria y desalojo
+    TablaQMapeada    archivo .qmap proyectado en memoria, con los cambios en un diccionario
+"""
+import pickle
+import struct
+from array import array
+import numpy as np
+
+LRU = 'lru'  # Desaloja las entradas visitadas hace más tiempo
+LFU = 'lfu'  # Desaloja las entradas con menos visitas
+
+
+class TablaQ:
+    """Tabla Q como diccionario de diccionarios, sin límite de tamaño"""
+    def __init__(self, datos=None):
+        self.datos = datos if datos is not None else {}
+
+    def tiene_estado(self, estado):
+        return estado in self.datos
+
+    def agregar_estado(self, estado):
+        if estado not in self.datos:
+            self.datos[estado] = {}
+
+    def consultar(self, estado, accion):
+        """Valor Q de (estado, accion), o None si no está"""
+        acciones = self.datos.get(estado)
+        return None if acciones is None else acciones.get(accion)
+
+    def obtener(self, estado, accion, inicial):
+        """Valor Q de (estado, accion); si no está, se guarda y devuelve inicial"""
+        acciones = self.datos.get(estado)
+        if acciones is None:
+            acciones = self.datos[estado] = {}
+        valor = acciones.get(accion)
+        if valor is None:
+            valor = acciones[accion] = inicial
+        return valor
+
+    def obtener_lote(self, estado, acciones, iniciales):
+        """obtener para varias acciones del mismo estado; devuelve la lista de valores"""
+        valores = self.datos.get(estado)
+        if valores is None:
+            valores = self.datos[estado] = {}
+        setdefault = valores.setdefault
+        return [setdefault(accion, inicial) for accion, inicial in zip(acciones, iniciales)]
+
+    def asignar(self, estado, accion, valor):
+        acciones = self.datos.get(estado)
+        if acciones is None:
+            acciones = self.datos[estado] = {}
+        acciones[accion] = valor
+
+    def __len__(self):
+        """Número de estados"""
+        return len(self.datos)
+
+    def a_dict(self):
+        return self.datos
+
+    def cargar_dict(self, datos):
+        self.datos = datos
+
+    def obtener_estadisticas(self):
+        return {
+            "estados": len(self.datos),
+            "entradas": sum(len(acciones) for acciones in self.datos.values())
+        }
+
+
+class TablaQCompacta:
+    """
+    Tabla Q de tamaño acotado con direccionamiento abierto (sondeo lineal) sobre arrays.
+    Cada ranura guarda la clave (estado, accion) en bytes de ancho fijo, el valor,
+    el instante de la última visita y el número de visitas (0 = ranura libre).
+    Que un estado es conocido se guarda como una entrada más con la acción vacía.
+    La ranura sale del hash de la tupla de enteros, que no depende de PYTHONHASHSEED,
+    así que la tabla puede enviarse a otros procesos.
+
+    La tabla crece hasta el límite de memoria; a partir de ahí, cuando se llena,
+    desaloja una fracción de las entradas según la política (LRU o LFU).
+    """
+    CARGA_MAXIMA = 0.75
+    CAPACIDAD_INICIAL = 1024
+
+    def __init__(self, memoria_mb=64, politica=LRU, fraccion_desalojo=0.25):
+        if politica not in (LRU, LFU):
+            raise ValueError(f"Política de desalojo desconocida: {politica}")
+        self.memoria_mb = memoria_mb
+        self.politica = politica
+        self.fraccion_desalojo = fraccion_desalojo
+        self.bytes_clave = 8  # Bytes por mitad de clave; crece si llegan claves más grandes
+        self.reloj = 0
+        self.desalojadas = 0
+        self.consultas = 0
+        self.aciertos = 0
+        self._reservar(self.CAPACIDAD_INICIAL)
+
+    def _reservar(self, capacidad):
+        self.capacidad = capacidad
+        self.ocupadas = 0
+        self.estados = 0
+        self._claves = bytearray(capacidad * 2 * self.bytes_clave)
+        self._valores = array('d', bytes(8 * capacidad))
+        self._visitado = array('Q', bytes(8 * capacidad))
+        self._visitas = array('I', bytes(4 * capacidad))
+
+    def bytes_por_entrada(self):
+        return 2 * self.bytes_clave + 8 + 8 + 4
+
+    def capacidad_maxima(self):
+        """Mayor potencia de dos de ranuras que cabe en memoria_mb"""
+        ranuras = int(self.memoria_mb * 1024 * 1024) // self.bytes_por_entrada()
+        capacidad = self.CAPACIDAD_INICIAL
+        while capacidad * 2 <= ranuras:
+            capacidad *= 2
+        return capacidad
+
+    def _clave(self, estado, accion):
+        """Clave en bytes y su hash; accion None es la entrada que marca el estado"""
+        n = self.bytes_clave
+        if estado.bit_length() > 8 * n or (accion is not None and accion.bit_length() > 8 * n):
+            self._ensanchar(max(estado.bit_length(), 0 if accion is None else accion.bit_length()))
+            n = self.bytes_clave
+        if accion is None:
+            return estado.to_bytes(n, 'little') + b'\xff' * n, hash((estado, -1))
+        return estado.to_bytes(n, 'little') + accion.to_bytes(n, 'little'), hash((estado, accion))
+
+    def _buscar(self, clave):
+        """Ranura de la clave, o -(ranura libre + 1) donde insertarla"""
+        clave, h = clave
+        ancho = len(clave)
+        mascara = self.capacidad - 1
+        i = h & mascara
+        claves, visitas = self._claves, self._visitas
+        while visitas[i]:
+            if claves[i * ancho:(i + 1) * ancho] == clave:
+                return i
+            i = (i + 1) & mascara
+        return -i - 1
+
+    def _insertar(self, clave, valor, visitado=None, visitas=1):
+        """Inserta una clave que no está, haciendo sitio antes si hace falta"""
+        if self.ocupadas + 1 > self.capacidad * self.CARGA_MAXIMA:
+            self._hacer_sitio()
+        i = -self._buscar(clave) - 1
+        clave = clave[0]
+        ancho = len(clave)
+        self._claves[i * ancho:(i + 1) * ancho] = clave
+        self._valores[i] = valor
+        self._visitado[i] = self.reloj if visitado is None else visitado
+        self._visitas[i] = visitas
+        self.ocupadas += 1
+        if clave[ancho // 2:] == b'\xff' * (ancho // 2):
+            self.estados += 1
+        return i
+
+    def _marcar_estado(self, estado):
+        clave = self._clave(estado, None)
+        if self._buscar(clave) < 0:
+            self._insertar(clave, 0.0)
+
+    def _insertar_accion(self, estado, accion, valor):
+        """
+        Inserta una acción que no está y la marca de su estado. El sitio para las
+        dos se hace antes, para que desalojar no se lleve la marca ya comprobada
+        """
+        while self.ocupadas + 2 > self.capacidad * self.CARGA_MAXIMA:
+            self._hacer_sitio()
+        self._marcar_estado(estado)
+        self._insertar(self._clave(estado, accion), valor)
+
+    def tiene_estado(self, estado):
+        return self._buscar(self._clave(estado, None)) >= 0
+
+    def agregar_estado(self, estado):
+        self.reloj += 1
+        self._marcar_estado(estado)
+
+    def consultar(self, estado, accion):
+        """Valor Q de (estado, accion), o None si no está"""
+        self.reloj += 1
+        self.consultas += 1
+        i = self._buscar(self._clave(estado, accion))
+        if i < 0:
+            return None
+        self.aciertos += 1
+        self._visitado[i] = self.reloj
+        self._visitas[i] += 1
+        return self._valores[i]
+
+    def obtener(self, estado, accion, inicial):
+        """Valor Q de (estado, accion); si no está, se guarda y devuelve inicial"""
+        valor = self.consultar(estado, accion)
+        if valor is None:
+            self._insertar_accion(estado, accion, inicial)
+            valor = inicial
+        return valor
+
+    def obtener_lote(self, estado, acciones, iniciales):
+        """obtener para varias acciones del mismo estado; devuelve la lista de valores"""
+        return [self.obtener(estado, accion, inicial) for accion, inicial in zip(acciones, iniciales)]
+
+    def asignar(self, estado, accion, valor):
+        self.reloj += 1
+        clave = self._clave(estado, accion)
+        i = self._buscar(clave)
+        if i >= 0:
+            self._valores[i] = valor
+            self._visitado[i] = self.reloj
+            return
+        self._insertar_accion(estado, accion, valor)
+
+    def _vivas(self):
+        return np.flatnonzero(np.frombuffer(self._visitas, dtype=np.uint32))
+
+    def _reconstruir(self, capacidad, ranuras, bytes_clave=None):
+        """Vuelve a insertar las entradas de las ranuras dadas en una tabla nueva"""
+        ancho_anterior = 2 * self.bytes_clave
+        mitad_anterior = self.bytes_clave
+        claves, valores = self._claves, self._valores
+        visitado, visitas = self._visitado, self._visitas
+        if bytes_clave is not None:
+            self.bytes_clave = bytes_clave
+        self._reservar(capacidad)
+        vacia = b'\xff' * mitad_anterior
+        for i in ranuras.tolist():
+            clave = claves[i * ancho_anterior:(i + 1) * ancho_anterior]
+            estado = int.from_bytes(clave[:mitad_anterior], 'little')
+            accion = None if clave[mitad_anterior:] == vacia else int.from_bytes(clave[mitad_anterior:], 'little')
+            self._insertar(self._clave(estado, accion), valores[i], visitado[i], visitas[i])
+
+    def _hacer_sitio(self):
+        """Duplica la tabla si cabe en memoria; si no, desaloja según la política"""
+        vivas = self._vivas()
+        if self.capacidad * 2 <= self.capacidad_maxima():
+            self._reconstruir(self.capacidad * 2, vivas)
+            return
+        desalojar = max(1, int(len(vivas) * self.fraccion_desalojo))
+        if self.politica == LRU:
+            prioridad = np.frombuffer(self._visitado, dtype=np.uint64)[vivas]
+        else:
+            prioridad = np.frombuffer(self._visitas, dtype=np.uint32)[vivas]
+        while True:
+            # Las marcas de estado de las acciones conservadas se conservan siempre;
+            # si con ellas no se libera nada, se desalojan más entradas
+            conservar = vivas[np.argpartition(prioridad, desalojar - 1)[desalojar:]]
+            conservar = self._con_marcas(vivas, conservar)
+            if len(conservar) < len(vivas):
+                break
+            desalojar = min(len(vivas), 2 * desalojar)
+        if self.politica == LFU:
+            # Envejecer los contadores para que las entradas nuevas puedan competir
+            visitas = np.frombuffer(self._visitas, dtype=np.uint32)
+            visitas[conservar] = np.maximum(1, visitas[conservar] >> 1)
+        self.desalojadas += len(vivas) - len(conservar)
+        self._reconstruir(self.capacidad, np.sort(conservar))
+
+    def _con_marcas(self, vivas, conservar):
+        """Añade a conservar la marca de estado de cada acción conservada, para que tiene_estado siga siendo cierto"""
+        n = self.bytes_clave
+        claves = np.frombuffer(self._claves, dtype=np.uint8).reshape(self.capacidad, 2 * n)
+        estados = np.ascontiguousarray(claves[:, :n]).view(f'V{n}').ravel()
+        es_marca = (claves[:, n:] == 0xff).all(axis=1)
+        con_acciones = estados[conservar[~es_marca[conservar]]]
+        marcas = vivas[es_marca[vivas] & np.isin(estados[vivas], con_acciones)]
+        return np.union1d(conservar, marcas)
+
+    def _ensanchar(self, bits):
+        bytes_clave = self.bytes_clave
+        while 8 * bytes_clave < bits:
+            bytes_clave *= 2
+        self._reconstruir(self.capacidad, self._vivas(), bytes_clave)
+
+    def __len__(self):
+        """Número de estados"""
+        return self.estados
+
+    def items(self):
+        """Recorre (estado, accion, valor); accion es None en las entradas que solo marcan un estado"""
+        n = self.bytes_clave
+        vacia = b'\xff' * n
+        for i in self._vivas().tolist():
+            clave = self._claves[i * 2 * n:(i + 1) * 2 * n]
+            estado = int.from_bytes(clave[:n], 'little')
+            accion = None if clave[n:] == vacia else int.from_bytes(clave[n:], 'little')
+            yield estado, accion, self._valores[i]
+
+    def a_dict(self):
+        """Exporta al formato {estado: {accion: valor}} de q_table.pkl"""
+        datos = {}
+        for estado, accion, valor in self.items():
+            acciones = datos.setdefault(estado, {})
+            if accion is not None:
+                acciones[accion] = valor
+        return datos
+
+    def cargar_dict(self, datos):
+        self.reloj = self.desalojadas = self.consultas = self.aciertos = 0
+        self._reservar(self.CAPACIDAD_INICIAL)
+        for estado, acciones in datos.items():
+            self.agregar_estado(estado)
+            for accion, valor in acciones.items():
+                self.asignar(estado, accion, valor)
+
+    def obtener_estadisticas(self):
+        return {
+            "estados": self.estados,
+            "entradas": self.ocupadas - self.estados,
+            "capacidad": self.capacidad,
+            "capacidad_maxima": self.capacidad_maxima(),
+            "ocupacion": (self.ocupadas / self.capacidad) * 100,
+            "memoria_mb": self.capacidad * self.bytes_por_entrada() / (1024 * 1024),
+            "desalojadas": self.desalojadas,
+            "politica": self.politica,
+            "tasa_aciertos": (self.aciertos / self.consultas) * 100 if self.consultas else 0.0
+        }
+
+
+MAGIA_MAPA = b'DAMASQ01'
+CABECERA_MAPA = struct.Struct('<8sQQQQ')
+TAM_CABECERA_MAPA = 64
+
+
+def _ancho(claves):
+    """Bytes necesarios para la mayor de las claves (al menos uno)"""
+    return max(1, (max(claves, default=0).bit_length() + 7) // 8)
+
+
+def escribir_mapa(f, datos):
+    """
+    Escribe {estado: {accion: valor}} en el formato de TablaQMapeada:
+
+        cabecera   magia, ancho de clave de estado y de acción, número de estados y de entradas
+        inicio     int64 x (estados + 1): primera entrada de cada estado
+        valores    float64 x entradas
+        estados    claves de estado ordenadas, big-endian de ancho fijo
+        acciones   claves de acción, ordenadas dentro de cada estado
+    """
+    estados = sorted(datos)
+    ancho_estado = _ancho(estados)
+    ancho_accion = _ancho([accion for acciones in datos.values() for accion in acciones])
+    inicio = [0]
+    acciones, valores = [], []
+    for estado in estados:
+        for accion in sorted(datos[estado]):
+            acciones.append(accion)
+            valores.append(datos[estado][accion])
+        inicio.append(len(acciones))
+    f.write(CABECERA_MAPA.pack(MAGIA_MAPA, ancho_estado, ancho_accion, len(estados), len(acciones)).ljust(TAM_CABECERA_MAPA, b'\0'))
+    f.write(np.array(inicio, dtype='<i8').tobytes())
+    f.write(np.array(valores, dtype='<f8').tobytes())
+    f.write(b''.join(estado.to_bytes(ancho_estado, 'big') for estado in estados))
+    f.write(b''.join(accion.to_bytes(ancho_accion, 'big') for accion in acciones))
+
+
+# Filas del archivo que se copian de una vez al mezclar (ver escribir_mezcla)
+BLOQUE_MEZCLA = 1 << 16
+
+
+def _ensanchar_claves(crudas, ancho, nuevo):
+    """Claves big-endian de ancho fijo, rellenadas con ceros por la izquierda hasta el nuevo ancho"""
+    if ancho == nuevo:
+        return crudas
+    filas = np.frombuffer(crudas, np.uint8).reshape(-1, ancho)
+    return np.pad(filas, ((0, 0), (nuevo - ancho, 0))).tobytes()
+
+
+def escribir_mezcla(f, origen):
+    """
+    Escribe en el formato de escribir_mapa la mezcla de una TablaQMapeada con una
+    TablaQ de cambios, origen = (mapa, cambios), sin pasar por un diccionario: los
+    tramos del archivo sin cambios se copian por bloques y solo los estados
+    cambiados se mezclan uno a uno. Los valores de cambios tienen prioridad.
+    """
+    mapa, cambios = origen
+    datos = cambios.datos
+    ancho_estado = max(mapa.ancho_estado, _ancho(datos))
+    ancho_accion = max(mapa.ancho_accion, _ancho([accion for acciones in datos.values() for accion in acciones]))
+    inicio = mapa._inicio
+
+    # Partes en el orden del archivo: slice de filas del archivo o (estado, acciones, valores)
+    partes = []
+    fila = 0
+    for estado in sorted(datos):
+        posicion, existe = mapa._posicion(estado)
+        for desde in range(fila, posicion, BLOQUE_MEZCLA):
+            partes.append(slice(desde, min(posicion, desde + BLOQUE_MEZCLA)))
+        acciones = {}
+        if existe:
+            desde, hasta = int(inicio[posicion]), int(inicio[posicion + 1])
+            claves = np.frombuffer(mapa._acciones[desde:hasta].tobytes(), np.uint8).reshape(-1, mapa.ancho_accion)
+            acciones = {int.from_bytes(clave.tobytes(), 'big'): valor
+                        for clave, valor in zip(claves, mapa._valores[desde:hasta].tolist())}
+            posicion += 1
+        fila = posicion
+        acciones.update(datos[estado])
+        ordenadas = sorted(acciones)
+        partes.append((estado, ordenadas, [acciones[accion] for accion in ordenadas]))
+    for desde in range(fila, len(mapa._estados), BLOQUE_MEZCLA):
+        partes.append(slice(desde, min(len(mapa._estados), desde + BLOQUE_MEZCLA)))
+
+    num_estados = num_entradas = 0
+    for parte in partes:
+        if isinstance(parte, slice):
+            num_estados += parte.stop - parte.start
+            num_entradas += int(inicio[parte.stop] - inicio[parte.start])
+        else:
+            num_estados += 1
+            num_entradas += len(parte[1])
+    f.write(CABECERA_MAPA.pack(MAGIA_MAPA, ancho_estado, ancho_accion, num_estados, num_entradas).ljust(TAM_CABECERA_MAPA, b'\0'))
+
+    entradas = 0
+    for parte in partes:
+        if isinstance(parte, slice):
+            f.write((inicio[parte.start:parte.stop] - inicio[parte.start] + entradas).astype('<i8').tobytes())
+            entradas += int(inicio[parte.stop] - inicio[parte.start])
+        else:
+            f.write(struct.pack('<q', entradas))
+            entradas += len(parte[1])
+    f.write(struct.pack('<q', entradas))
+    for parte in partes:
+        if isinstance(parte, slice):
+            f.write(mapa._valores[int(inicio[parte.start]):int(inicio[parte.stop])].tobytes())
+        else:
+            f.write(np.array(parte[2], dtype='<f8').tobytes())
+    for parte in partes:
+        if isinstance(parte, slice):
+            f.write(_ensanchar_claves(mapa._estados[parte].tobytes(), mapa.ancho_estado, ancho_estado))
+        else:
+            f.write(parte[0].to_bytes(ancho_estado, 'big'))
+    for parte in partes:
+        if isinstance(parte, slice):
+            crudas = mapa._acciones[int(inicio[parte.start]):int(inicio[parte.stop])].tobytes()
+            f.write(_ensanchar_claves(crudas, mapa.ancho_accion, ancho_accion))
+        else:
+            f.write(b''.join(accion.to_bytes(ancho_accion, 'big') for accion in parte[1]))
+
+
+class TablaQMapeada:
+    """
+    Tabla Q leída de un archivo .qmap proyectado en memoria (ver escribir_mapa).
+    Abrirla no carga nada: el sistema trae del disco solo las páginas de los estados
+    consultados y varios procesos que abren el mismo archivo comparten esas páginas.
+    El archivo nunca se modifica en el sitio: los valores nuevos o modificados van a
+    una TablaQ superpuesta. Con escritura, QLearningAgent.save_q_table mezcla esos
+    cambios con el archivo (ver escribir_mezcla); sin ella, que es lo normal en los
+    procesos que solo juegan, los cambios no se guardan.
+    Las claves se buscan por bisección sobre los arrays ordenados.
+    """
+    def __init__(self, ruta=None, escritura=False):
+        self.escritura = escritura
+        self.abrir(ruta)
+
+    def abrir(self, ruta):
+        """Proyecta el archivo (o deja la tabla vacía si ruta es None) y descarta los cambios"""
+        self.ruta = ruta
+        self.cambios = TablaQ()
+        self._nuevos = 0  # Estados de self.cambios que no están en el archivo
+        self._entradas_nuevas = 0  # Ídem para las acciones
+        self._mapa = None
+        if ruta is None:
+            self.ancho_estado = self.ancho_accion = 1
+            self._inicio = np.zeros(1, dtype='<i8')
+            self._valores = np.zeros(0, dtype='<f8')
+            self._estados = np.zeros(0, dtype='S1')
+            self._acciones = np.zeros(0, dtype='S1')
+            return
+        self._mapa = np.memmap(ruta, dtype=np.uint8, mode='r')
+        magia, self.ancho_estado, self.ancho_accion, num_estados, num_entradas = \
+            CABECERA_MAPA.unpack_from(self._mapa)
+        if magia != MAGIA_MAPA:
+            raise ValueError(f"{ruta} no es una tabla Q proyectable")
+        desplazamiento = TAM_CABECERA_MAPA
+        self._inicio = np.frombuffer(self._mapa, '<i8', num_estados + 1, desplazamiento)
+        desplazamiento += 8 * (num_estados + 1)
+        self._valores = np.frombuffer(self._mapa, '<f8', num_entradas, desplazamiento)
+        desplazamiento += 8 * num_entradas
+        self._estados = np.frombuffer(self._mapa, f'S{self.ancho_estado}', num_estados, desplazamiento)
+        desplazamiento += self.ancho_estado * num_estados
+        self._acciones = np.frombuffer(self._mapa, f'S{self.ancho_accion}', num_entradas, desplazamiento)
+
+    def __reduce__(self):
+        # Otro proceso vuelve a proyectar el archivo en vez de recibir una copia de los arrays
+        return (TablaQMapeada, (self.ruta, self.escritura),
+                {'cambios': self.cambios, '_nuevos': self._nuevos, '_entradas_nuevas': self._entradas_nuevas})
+
+    @staticmethod
+    def _bisecar(claves, clave, ancho, desde=0, hasta=None):
+        """Posición de clave en claves[desde:hasta], o -1"""
+        if clave.bit_length() > 8 * ancho:
+            return -1
+        hasta = len(claves) if hasta is None else hasta
+        # Los arrays 'S' quitan los ceros finales al leer: se compara sin ellos
+        buscada = clave.to_bytes(ancho, 'big')
+        i = desde + int(np.searchsorted(claves[desde:hasta], buscada))
+        if i < hasta and claves[i] == buscada.rstrip(b'\0'):
+            return i
+        return -1
+
+    def _posicion(self, estado):
+        """(fila del estado en el archivo o donde iría, si está en el archivo)"""
+        if estado.bit_length() > 8 * self.ancho_estado:
+            return len(self._estados), False
+        buscada = estado.to_bytes(self.ancho_estado, 'big')
+        i = int(np.searchsorted(self._estados, buscada))
+        return i, i < len(self._estados) and self._estados[i] == buscada.rstrip(b'\0')
+
+    def _fila(self, estado):
+        return self._bisecar(self._estados, estado, self.ancho_estado)
+
+    def _en_mapa(self, estado, accion):
+        fila = self._fila(estado)
+        if fila < 0:
+            return None
+        i = self._bisecar(self._acciones, accion, self.ancho_accion,
+                          int(self._inicio[fila]), int(self._inicio[fila + 1]))
+        return None if i < 0 else float(self._valores[i])
+
+    def _anotar_estado(self, estado):
+        if not self.cambios.tiene_estado(estado) and self._fila(estado) < 0:
+            self._nuevos += 1
+
+    def tiene_estado(self, estado):
+        return self.cambios.tiene_estado(estado) or self._fila(estado) >= 0
+
+    def agregar_estado(self, estado):
+        if not self.tiene_estado(estado):
+            self._nuevos += 1
+            self.cambios.agregar_estado(estado)
+
+    def consultar(self, estado, accion):
+        """Valor Q de (estado, accion), o None si no está"""
+        valor = self.cambios.consultar(estado, accion)
+        return self._en_mapa(estado, accion) if valor is None else valor
+
+    def obtener(self, estado, accion, inicial):
+        """Valor Q de (estado, accion); si no está, se guarda y devuelve inicial"""
+        valor = self.consultar(estado, accion)
+        if valor is None:
+            self.asignar(estado, accion, inicial)
+            valor = inicial
+        return valor
+
+    def obtener_lote(self, estado, acciones, iniciales):
+        """obtener para varias acciones del mismo estado; devuelve la lista de valores"""
+        return [self.obtener(estado, accion, inicial) for accion, inicial in zip(acciones, iniciales)]
+
+    def asignar(self, estado, accion, valor):
+        self._anotar_estado(estado)
+        if self.cambios.consultar(estado, accion) is None and self._en_mapa(estado, accion) is None:
+            self._entradas_nuevas += 1
+        self.cambios.asignar(estado, accion, valor)
+
+    def __len__(self):
+        """Número de estados"""
+        return len(self._estados) + self._nuevos
+
+    def a_dict(self):
+        """Exporta el archivo más los cambios al formato {estado: {accion: valor}} de q_table.pkl"""
+        ancho_estado, ancho_accion = self.ancho_estado, self.ancho_accion
+        estados = np.frombuffer(self._estados.tobytes(), np.uint8).reshape(-1, ancho_estado)
+        acciones = np.frombuffer(self._acciones.tobytes(), np.uint8).reshape(-1, ancho_accion)
+        inicio, valores = self._inicio.tolist(), self._valores.tolist()
+        datos = {}
+        for fila in range(len(estados)):
+            destino = datos[int.from_bytes(estados[fila].tobytes(), 'big')] = {}
+            for i in range(inicio[fila], inicio[fila + 1]):
+                destino[int.from_bytes(acciones[i].tobytes(), 'big')] = valores[i]
+        for estado, acciones_cambiadas in self.cambios.a_dict().items():
+            datos.setdefault(estado, {}).update(acciones_cambiadas)
+        return datos
+
+    def cargar_dict(self, datos):
+        """Sustituye el contenido por datos, que quedan como cambios hasta el próximo guardado"""
+        self.abrir(None)
+        self.cambios.cargar_dict(datos)
+        self._nuevos = len(datos)
+        self._entradas_nuevas = sum(len(acciones) for acciones in datos.values())
+
+    def obtener_estadisticas(self):
+        cambios = self.cambios.obtener_estadisticas()
+        return {
+            "estados": len(self),
+            "entradas": len(self._valores) + self._entradas_nuevas,
+            "mapeadas": len(self._valores),
+            "modificadas": cambios["entradas"],
+            "archivo": self.ruta
+        }
+
+
+def leer_tabla(ruta):
+    """Lee un q_table.pkl o un .qmap como {estado: {accion: valor}}"""
+    if ruta.endswith('.qmap'):
+        return TablaQMapeada(ruta).a_dict()
+    with open(ruta, 'rb') as f:
+        return pickle.load(f)
+
+
+if __name__ == "__main__":
+    # Convierte entre q_table.pkl y .qmap según las extensiones: python tabla_q.py q_table.pkl q_table.qmap
+    import sys
+    origen, destino = sys.argv[1], sys.argv[2]
+    from qlearning import migrar_q_table, guardar_atomico
+    datos = migrar_q_table(leer_tabla(origen))
+    guardar_atomico(destino, datos, escribir_mapa if destino.endswith('.qmap') else None)
+    print(f"Tabla Q convertida: {len(datos)} estados de {origen} a {destino}")
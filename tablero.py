@@ -1,121 +1,156 @@
-import pygame
 from constantes import *
 from pieza import Pieza
-import copy
+from motor import Motor
 
 class Tablero:
-    def __init__(self):
-        self.tablero = []
-        self.ROJO_left = self.BLANCO_left = 2
-        self.ROJO_kings = self.BLANCO_kings = 0
-        self.crear_tablero()
+    """
+    Vista de dibujado sobre el Motor de bitboards. La cuadrícula de objetos
+    Pieza solo se construye cuando alguien la pide (dibujo o get_pieza).
+    El tamaño lo fija la Geometria del motor.
+    """
+    def __init__(self, motor=None, geometria=None):
+        self.motor = motor if motor is not None else Motor(geometria=geometria)
+        self._cuadricula = None
+
+    @property
+    def geometria(self):
+        return self.motor.geometria
+
+    @property
+    def filas(self):
+        return self.motor.geometria.filas
+
+    @property
+    def columnas(self):
+        return self.motor.geometria.columnas
+
+    @property
+    def tam_casilla(self):
+        """Lado de una casilla en píxeles para que el tablero ocupe la ventana"""
+        return ANCHO // max(self.filas, self.columnas)
+
+    @property
+    def tablero(self):
+        if self._cuadricula is None:
+            self._cuadricula = self.crear_cuadricula()
+        return self._cuadricula
+
+    @property
+    def ROJO_left(self):
+        return self.motor.num_piezas(ROJO)
+
+    @property
+    def BLANCO_left(self):
+        return self.motor.num_piezas(BLANCO)
+
+    @property
+    def total_piezas(self):
+        return self.motor.total_piezas()
+
+    @property
+    def ROJO_kings(self):
+        return self.motor.num_reyes(ROJO)
+
+    @property
+    def BLANCO_kings(self):
+        return self.motor.num_reyes(BLANCO)
+
+    def copiar(self):
+        """Copia barata: solo se duplican los bitboards"""
+        return Tablero(self.motor.copiar())
 
     def draw_cuadrados(self, win):
+        import pygame
+        tam = self.tam_casilla
         win.fill(NEGRO)
-        for fil in range(FILAS):
-            for col in range(fil % 2, COLUMNAS, 2):
-                pygame.draw.rect(win, ROJO_TAB, (fil * TAM_CASILLA, col * TAM_CASILLA, TAM_CASILLA, TAM_CASILLA))
+        for fil in range(self.filas):
+            for col in range(fil % 2, self.columnas, 2):
+                pygame.draw.rect(win, ROJO_TAB, (col * tam, fil * tam, tam, tam))
 
     def move(self, pieza, fil, col):
-        self.tablero[pieza.fil][pieza.col], self.tablero[fil][col] = self.tablero[fil][col], self.tablero[pieza.fil][pieza.col]
+        g = self.geometria
+        self.motor.mover(g.casilla(pieza.fil, pieza.col), g.casilla(fil, col))
         pieza.move(fil, col)
-        if (fil == FILAS - 1 or fil == 0) and not pieza.king:
+        if (fil == g.filas - 1 or fil == 0) and not pieza.king:
             pieza.make_king()
-            if pieza.color == BLANCO:
-                self.BLANCO_kings += 1
-            else:
-                self.ROJO_kings += 1
+        self._cuadricula = None
 
     def get_pieza(self, fil, col):
         return self.tablero[fil][col]
 
     def crear_tablero(self):
-        for fil in range(FILAS):
-            self.tablero.append([])
-            for col in range(COLUMNAS):
-                if col % 2 == ((fil + 1) % 2):
-                    if fil < 1:
-                        self.tablero[fil].append(Pieza(fil, col, BLANCO))
-                    elif fil > 2:
-                        self.tablero[fil].append(Pieza(fil, col, ROJO))
-                    else:
-                        self.tablero[fil].append(0)
+        self.motor.posicion_inicial()
+        self._cuadricula = None
+
+    def crear_cuadricula(self):
+        """Construye la cuadrícula de objetos Pieza a partir de los bitboards"""
+        g = self.geometria
+        tam = self.tam_casilla
+        cuadricula = []
+        for fil in range(g.filas):
+            cuadricula.append([])
+            for col in range(g.columnas):
+                contenido = self.motor.get_casilla(g.casilla(fil, col))
+                if contenido is None:
+                    cuadricula[fil].append(0)
                 else:
-                    self.tablero[fil].append(0)
+                    color, king = contenido
+                    pieza = Pieza(fil, col, color, tam)
+                    if king:
+                        pieza.make_king()
+                    cuadricula[fil].append(pieza)
+        return cuadricula
 
     def draw(self, win):
         self.draw_cuadrados(win)
-        for fil in range(FILAS):
-            for col in range(COLUMNAS):
-                pieza = self.tablero[fil][col]
+        for fila in self.tablero:
+            for pieza in fila:
                 if pieza != 0:
                     pieza.draw(win)
 
     def eliminar(self, piezas):
         for pieza in piezas:
             fil, col = pieza
-            piece = self.tablero[fil][col]
-            if piece != 0:  # Verificar antes de eliminar
-                if piece.color == ROJO:
-                    self.ROJO_left -= 1
-                else:
-                    self.BLANCO_left -= 1
-            self.tablero[fil][col] = 0
+            self.motor.eliminar(self.geometria.casilla(fil, col))
+        self._cuadricula = None
 
     def ganador(self):
-        if self.ROJO_left <= 0:
-            return BLANCO
-        elif self.BLANCO_left <= 0:
-            return ROJO
-        return None
-    
+        return self.motor.ganador()
+
     def get_movimientos_validos(self, pieza):
-        movimientos = {}
-        direcciones = []
-
-        if pieza.king:
-            direcciones = [
-                (-1, -1), (-1, 1),  # Movimientos diagonales hacia arriba
-                (1, -1), (1, 1)     # Movimientos diagonales hacia abajo
-            ]
-        else:
-            if pieza.color == ROJO:
-                direcciones = [(-1, -1), (-1, 1)]  # Movimientos diagonales hacia arriba
-            else:  # BLANCO
-                direcciones = [(1, -1), (1, 1)]    # Movimientos diagonales hacia abajo
-
-        for dir in direcciones:
-            fil, col = pieza.fil + dir[0], pieza.col + dir[1]
-            if 0 <= fil < FILAS and 0 <= col < COLUMNAS:
-                siguiente_fila, siguiente_columna = fil + dir[0], col + dir[1]
-                if self.tablero[fil][col] == 0:  # Posición vacía
-                    movimientos[(fil, col)] = []
-                elif self.tablero[fil][col].color != pieza.color:
-                    # Verificar que la pieza a capturar es del color opuesto
-                    if 0 <= siguiente_fila < FILAS and 0 <= siguiente_columna < COLUMNAS:
-                        if self.tablero[siguiente_fila][siguiente_columna] == 0:
-                            movimientos[(siguiente_fila, siguiente_columna)] = [(fil, col)]
-
-        return movimientos
+        return self.motor.get_movimientos_validos(pieza.fil, pieza.col, pieza.color, pieza.king)
 
     def is_blocked(self, color):
-        for fil in range(FILAS):
-            for col in range(COLUMNAS):
-                pieza = self.tablero[fil][col]
-                if pieza != 0 and pieza.color == color:
-                    if self.get_movimientos_validos(pieza):
-                        return False
-        return True
+        return self.motor.bloqueado(color)
+
+    def get_movimientos(self, color):
+        """Lista de movimientos (origen, destino, capturada) de un color"""
+        return self.motor.generar_movimientos(color)
+
+    def make_move(self, movimiento):
+        """
+        Aplica un movimiento (origen, destino, capturada) en el sitio.
+        Cubre la captura, la coronación y los contadores de piezas.
+        Returns:
+            registro para deshacer el movimiento con unmake_move
+        """
+        deshacer = self.motor.hacer_movimiento(movimiento)
+        self._cuadricula = None
+        return deshacer
+
+    def unmake_move(self, deshacer):
+        """Restaura el estado anterior a make_move"""
+        self.motor.deshacer_movimiento(deshacer)
+        self._cuadricula = None
 
     def simulate_move(self, piece, row, col):
         """Simula un movimiento y devuelve el nuevo estado del tablero"""
-        board = copy.deepcopy(self)
+        board = self.copiar()
         moves = self.get_movimientos_validos(piece)
-        if (row, col) in moves:
-            skipped = moves[(row, col)]
-            if skipped:
-                board.eliminar(skipped)
-        board.move(board.get_pieza(piece.fil, piece.col), row, col)
+        skipped = moves.get((row, col))
+        g = self.geometria
+        capturada = g.casilla(*skipped[0]) if skipped else None
+        board.make_move((g.casilla(piece.fil, piece.col), g.casilla(row, col), capturada))
         return board
 
     def piezas_capturadas(self, nuevo_tablero):
@@ -124,8 +159,4 @@ class Tablero:
         Returns:
             bool: True si hubo capturas, False en caso contrario
         """
-        piezas_actual = sum(1 for fil in range(FILAS) for col in range(COLUMNAS) 
-                           if self.tablero[fil][col] != 0)
-        piezas_nuevo = sum(1 for fil in range(FILAS) for col in range(COLUMNAS) 
-                          if nuevo_tablero.tablero[fil][col] != 0)
-        return piezas_actual > piezas_nuevo
+        return self.motor.total_piezas() > nuevo_tablero.motor.total_piezas()
@@ -0,0 +1,211 @@
+"""
+Telemetría del entrenamiento: tiempo por fase, contadores y medidas del agente,
+escritos cada cierto tiempo como líneas JSON en un archivo.
+
+    train_ai(10000, archivo_telemetria='telemetria.jsonl')
+
+Las fases se miden y los contadores (capturas, checkpoints, victorias, derrotas y
+empates) se cuentan envolviendo los métodos del juego, del agente y del tablero,
+así que con la telemetría desactivada (TelemetriaNula) el bucle de entrenamiento
+no hace ningún trabajo extra; cerrar quita las envolturas, de modo que el agente
+no sigue midiendo en entrenamientos o partidas posteriores. El tiempo de cada fase es exclusivo: no incluye el
+de las fases que se llaman desde ella (p. ej. 'oponente' no incluye 'generar').
+"""
+import json
+import time
+from time import perf_counter
+
+# (objeto, método, fase) que se miden en cada partida de train_ai
+FASES_JUEGO = [
+    ('juego', 'reset', 'reiniciar'),
+    ('juego', 'get_all_possible_moves', 'generar'),
+    ('juego', 'ai_move', 'oponente'),
+    ('juego', 'calcular_recompensa', 'recompensa'),
+    ('juego', 'change_turn', 'turno'),
+    ('agente', 'get_action', 'elegir'),
+    ('agente', 'get_state_key', 'claves'),
+    ('agente', 'get_action_key', 'claves'),
+    ('agente', 'learn', 'aprender'),
+    ('checkpoint', 'guardar', 'checkpoint'),
+]
+
+
+class TelemetriaNula:
+    """Telemetría desactivada: no instrumenta nada"""
+    activa = False
+
+    def instrumentar_juego(self, juego):
+        pass
+
+    def cerrar(self):
+        pass
+
+
+class Telemetria:
+    """
+    Acumula segundos y llamadas por fase y contadores libres, y cada cada_segundos
+    escribe una línea JSON con los totales, el ritmo del último intervalo
+    (episodios/s, pasos/s) y las medidas que devuelven las funciones de self.medidas.
+    """
+    activa = True
+
+    def __init__(self, ruta, cada_segundos=10.0):
+        self.ruta = ruta
+        self.cada_segundos = cada_segundos
+        self.archivo = open(ruta, 'a')
+        self.fases = {}  # fase: [segundos, llamadas]
+        self.contadores = {}
+        self.medidas = []  # Funciones sin argumentos que devuelven un diccionario
+        self._anidadas = [0.0]  # Tiempo de las fases anidadas, uno por nivel de llamada
+        self.inicio = perf_counter()
+        self._ultima_emision = self.inicio
+        self._ultimos = (0, 0)  # (episodios, pasos) en la última emisión
+        self._parches = []  # (objeto, método, atributo de instancia anterior o None), ver cerrar
+        self._tablero = None  # Tablero instrumentado de la partida actual
+
+    def _parchear(self, objeto, metodo, envoltura):
+        """Pone envoltura como atributo de instancia y lo anota para que cerrar lo quite"""
+        self._parches.append((objeto, metodo, objeto.__dict__.get(metodo)))
+        setattr(objeto, metodo, envoltura)
+
+    def _quitar_parches(self):
+        """Deshace los parches en orden inverso: cada método vuelve a ser el de antes"""
+        for objeto, metodo, anterior in reversed(self._parches):
+            if anterior is None:
+                delattr(objeto, metodo)
+            else:
+                setattr(objeto, metodo, anterior)
+        self._parches = []
+
+    def contar(self, nombre, n=1):
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    def contar_llamadas(self, objeto, metodo, contador):
+        """
+        Sustituye objeto.metodo por una versión que, en cada llamada, suma uno al
+        contador que devuelve contador(*args, **kwargs) (ninguno si devuelve None)
+        """
+        original = getattr(objeto, metodo)
+
+        def contado(*args, **kwargs):
+            nombre = contador(*args, **kwargs)
+            if nombre is not None:
+                self.contar(nombre)
+            return original(*args, **kwargs)
+
+        self._parchear(objeto, metodo, contado)
+        return contado
+
+    def instrumentar(self, objeto, metodo, fase=None):
+        """Sustituye objeto.metodo por una versión que acumula su tiempo en la fase"""
+        original = getattr(objeto, metodo)
+        acumulado = self.fases.setdefault(fase or metodo, [0.0, 0])
+        anidadas = self._anidadas
+
+        def medido(*args, **kwargs):
+            anidadas.append(0.0)
+            inicio = perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                duracion = perf_counter() - inicio
+                acumulado[0] += duracion - anidadas.pop()
+                acumulado[1] += 1
+                anidadas[-1] += duracion
+
+        self._parchear(objeto, metodo, medido)
+        return medido
+
+    def instrumentar_juego(self, juego):
+        """Mide las fases de FASES_JUEGO y el tablero de cada partida; emite al reiniciar si toca"""
+        objetos = {'juego': juego, 'agente': juego.q_agent, 'checkpoint': juego.checkpoint}
+        for nombre, metodo, fase in FASES_JUEGO:
+            self.instrumentar(objetos[nombre], metodo, fase)
+        self.contar_llamadas(juego.checkpoint, 'guardar', lambda: 'checkpoints')
+        self.contar_llamadas(juego.q_agent, 'registrar_partida', lambda resultado, *args, **kwargs: resultado + 's')
+        self.instrumentar_tablero(juego.tablero)
+        reset = juego.reset
+
+        def reset_medido(*args, **kwargs):
+            resultado = reset(*args, **kwargs)
+            # Cada partida crea un tablero nuevo
+            self.instrumentar_tablero(juego.tablero)
+            self.emitir_si_toca()
+            return resultado
+
+        self._parchear(juego, 'reset', reset_medido)
+        self.medidas.append(lambda: medidas_agente(juego.q_agent))
+        self.medidas.append(lambda: {"cache_sucesores": juego.cache_sucesores.obtener_estadisticas()})
+        if juego.q_agent.finales is not None:
+            self.medidas.append(lambda: {"finales": juego.q_agent.finales.obtener_estadisticas()})
+        if juego.busqueda is not None and juego.busqueda.tt is not None:
+            self.medidas.append(lambda: {"tt": juego.busqueda.tt.obtener_estadisticas()})
+
+    def instrumentar_tablero(self, tablero):
+        """Mide los movimientos del tablero y cuenta las capturas"""
+        if self._tablero is not None:
+            # El tablero de la partida anterior ya no se usa: se olvidan sus parches
+            self._parches = [parche for parche in self._parches if parche[0] is not self._tablero]
+        self._tablero = tablero
+        self.instrumentar(tablero, 'make_move', 'mover')
+        self.contar_llamadas(tablero, 'make_move', lambda movimiento: 'capturas' if movimiento[2] is not None else None)
+
+    def episodios(self):
+        return self.fases.get('reiniciar', [0.0, 0])[1]
+
+    def pasos(self):
+        return self.fases.get('mover', [0.0, 0])[1]
+
+    def emitir_si_toca(self):
+        if perf_counter() - self._ultima_emision >= self.cada_segundos:
+            self.emitir()
+
+    def emitir(self):
+        ahora = perf_counter()
+        intervalo = ahora - self._ultima_emision
+        episodios, pasos = self.episodios(), self.pasos()
+        registro = {
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "segundos": ahora - self.inicio,
+            "episodios": episodios,
+            "pasos": pasos,
+            "episodios_por_segundo": (episodios - self._ultimos[0]) / intervalo if intervalo > 0 else 0.0,
+            "pasos_por_segundo": (pasos - self._ultimos[1]) / intervalo if intervalo > 0 else 0.0,
+            "fases": {fase: {"segundos": segundos, "llamadas": llamadas}
+                      for fase, (segundos, llamadas) in self.fases.items()},
+            "contadores": dict(self.contadores)
+        }
+        for medida in self.medidas:
+            registro.update(medida())
+        self.archivo.write(json.dumps(registro) + "\n")
+        self.archivo.flush()
+        self._ultima_emision = ahora
+        self._ultimos = (episodios, pasos)
+
+    def cerrar(self):
+        """Escribe el último registro, cierra el archivo y devuelve sus métodos a los objetos instrumentados"""
+        if not self.archivo.closed:
+            self.emitir()
+            self.archivo.close()
+        self._quitar_parches()
+
+
+def medidas_agente(agente):
+    """Tamaño de la tabla Q, exploración y resultados del agente"""
+    stats = agente.obtener_estadisticas()
+    medidas = {
+        "estados_q": len(agente.q_table),
+        "epsilon": agente.epsilon,
+        "tasa_victorias": stats["tasa_victorias"],
+        "recompensa_promedio": stats["recompensa_promedio"]
+    }
+    tabla = agente.q_table.obtener_estadisticas()
+    if "tasa_aciertos" in tabla:
+        medidas["tasa_aciertos_q"] = tabla["tasa_aciertos"]
+        medidas["desalojadas_q"] = tabla["desalojadas"]
+    return medidas
+
+
+def crear_telemetria(ruta=None, cada_segundos=10.0):
+    """Telemetria que escribe en ruta, o TelemetriaNula si ruta es None"""
+    return Telemetria(ruta, cada_segundos) if ruta else TelemetriaNula()
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+
+EXACTA = 0
+INFERIOR = 1  # La puntuación es una cota inferior (corte beta)
+SUPERIOR = 2  # La puntuación es una cota superior (ningún movimiento superó alfa)
+
+# Memoria aproximada por entrada: seis referencias por ranura más los enteros y floats guardados
+BYTES_POR_ENTRADA = 96
+
+
+class TablaTransposicion:
+    """
+    Tabla de transposición de tamaño fijo indexada por hash Zobrist.
+    Cada ranura guarda clave, profundidad, puntuación, tipo de cota y mejor movimiento.
+    Reemplazo con preferencia por profundidad: una entrada solo se sustituye por otra
+    de igual o mayor profundidad, salvo que sea de una búsqueda anterior.
+    """
+    def __init__(self, memoria_mb=16):
+        self.memoria_mb = memoria_mb
+        self.tamano = max(1, int(memoria_mb * 1024 * 1024) // BYTES_POR_ENTRADA)
+        self.claves = [None] * self.tamano
+        self.profundidades = [0] * self.tamano
+        self.puntuaciones = [0] * self.tamano
+        self.tipos = [EXACTA] * self.tamano
+        self.movimientos = [None] * self.tamano
+        self.generaciones = [0] * self.tamano
+        self.generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.ocupadas = 0
+
+    def nueva_busqueda(self):
+        """Marca las entradas existentes como antiguas para que puedan reemplazarse"""
+        self.generacion += 1
+
+    def buscar(self, clave):
+        """
+        Returns:
+            (profundidad, puntuacion, tipo, movimiento) o None si la posición no está
+        """
+        i = clave % self.tamano
+        if self.claves[i] == clave:
+            self.aciertos += 1
+            return self.profundidades[i], self.puntuaciones[i], self.tipos[i], self.movimientos[i]
+        self.fallos += 1
+        return None
+
+    def consultar(self, clave):
+        """Como buscar, pero sin contar aciertos ni fallos"""
+        i = clave % self.tamano
+        if self.claves[i] == clave:
+            return self.profundidades[i], self.puntuaciones[i], self.tipos[i], self.movimientos[i]
+        return None
+
+    def guardar(self, clave, profundidad, puntuacion, tipo, movimiento):
+        i = clave % self.tamano
+        actual = self.claves[i]
+        if actual is None:
+            self.ocupadas += 1
+        elif (actual != clave and self.generaciones[i] == self.generacion
+                and profundidad < self.profundidades[i]):
+            return
+        self.claves[i] = clave
+        self.profundidades[i] = profundidad
+        self.puntuaciones[i] = puntuacion
+        self.tipos[i] = tipo
+        self.movimientos[i] = movimiento
+        self.generaciones[i] = self.generacion
+
+    def limpiar(self):
+        self.__init__(self.memoria_mb)
+
+    def obtener_estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            "tamano": self.tamano,
+            "ocupadas": self.ocupadas,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": (self.aciertos / consultas) * 100 if consultas else 0.0
+        }
+
+
+class CacheSucesores:
+    """
+    Caché LRU de los movimientos de cada posición: (clave, color) -> (movimientos, capturas),
+    con capturas[i] cierto si movimientos[i] captura. Las listas son compartidas
+    entre consultas, así que quien las recibe no debe modificarlas.
+    """
+    def __init__(self, capacidad=65536):
+        self.capacidad = capacidad
+        self.entradas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojadas = 0
+
+    def obtener(self, motor, color):
+        clave = (motor.clave(), color)
+        entrada = self.entradas.get(clave)
+        if entrada is not None:
+            self.aciertos += 1
+            self.entradas.move_to_end(clave)
+            return entrada
+        self.fallos += 1
+        movimientos = motor.generar_movimientos(color)
+        entrada = (movimientos, [movimiento[2] is not None for movimiento in movimientos])
+        self.entradas[clave] = entrada
+        if len(self.entradas) > self.capacidad:
+            self.entradas.popitem(last=False)
+            self.desalojadas += 1
+        return entrada
+
+    def movimientos(self, motor, color):
+        return self.obtener(motor, color)[0]
+
+    def limpiar(self):
+        self.__init__(self.capacidad)
+
+    def obtener_estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            "tamano": len(self.entradas),
+            "capacidad": self.capacidad,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "desalojadas": self.desalojadas,
+            "tasa_aciertos": (self.aciertos / consultas) * 100 if consultas else 0.0
+        }